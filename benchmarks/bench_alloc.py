@@ -0,0 +1,67 @@
+#benchmarks/bench_alloc.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# How much memory speak needs on top of what it already had for utterances of a few sizes, measured with tracemalloc,
+# for the driver in the working tree and the original driver from the first commit or the one from the git revision given with --before.
+# The peak counts every copy of the utterance alive at the same time, so it shows how many times a long one gets copied on its way to the dll.
+# Run it with: python benchmarks/bench_alloc.py [--before=rev]
+
+import sys
+import tracemalloc
+
+import nvdastubs
+from nvdastubs import IndexCommand, PitchCommand
+
+sentence = "It was the best of times, it was the worst of times, it cost $12.50 at 10:30 on the 21st. "
+
+def makeSequence(size):
+	sequence = []
+	length = 0
+	while length < size:
+		sequence.append(IndexCommand(len(sequence)))
+		text = sentence[:size-length] if size-length < len(sentence) else sentence
+		sequence.append(text)
+		length += len(text)
+	return sequence
+
+utterances = (
+	("link", ["link", PitchCommand(20), "H", PitchCommand(0), "ome", IndexCommand(1)]),
+	("line 300 bytes", makeSequence(300)),
+	("paragraph 3 KB", makeSequence(3000)),
+	("say all 40 KB", makeSequence(40000)),
+)
+
+def measure(ttusb, sequence, repeats=20):
+	synth = nvdastubs.createSynth(ttusb)
+	peaks = []
+	for repeat in range(repeats):
+		tracemalloc.reset_peak()
+		current = tracemalloc.get_traced_memory()[0]
+		synth.speak(sequence)
+		nvdastubs.waitForWrites(synth)
+		peaks.append(tracemalloc.get_traced_memory()[1]-current)
+		synth.cancel()
+		nvdastubs.waitForWrites(synth)
+	synth.terminate()
+	peaks.sort()
+	return peaks[len(peaks)//2]
+
+def main():
+	before = None
+	for arg in sys.argv[1:]:
+		if arg.startswith("--before="):
+			before = arg.split("=", 1)[1]
+	nvdastubs.install()
+	drivers = (("before", nvdastubs.loadDriver(before or nvdastubs.baselineRev())), ("after", nvdastubs.loadDriver()))
+	tracemalloc.start()
+	for name, sequence in utterances:
+		size = sum(len(item) for item in sequence if isinstance(item, str))
+		results = ["%s %9d bytes" % (driverName, measure(ttusb, sequence)) for driverName, ttusb in drivers]
+		print("%-16s %7d bytes of text   peak  %s" % (name, size, "   ".join(results)))
+	tracemalloc.stop()
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,75 @@
+#benchmarks/bench_cache.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# How long speak takes for the sequences NVDA sends while moving around, where the same roles, states and names come up again and again,
+# and for say all where nearly every line is new, for the driver in the working tree and the original driver from the first commit
+# or the one from the git revision given with --before.  Only the time spent in speak is counted, not writing.
+# Also shows how often the driver in the working tree found the text already encoded.
+# Run it with: python benchmarks/bench_cache.py [--before=rev] [--steps=5000]
+
+import sys
+import time
+
+import nvdastubs
+from nvdastubs import IndexCommand, PitchCommand
+from bench_latency import percentile
+
+roles = ["button", "link", "blank", "check box", "not checked", "checked", "edit", "read only", "heading level 2", "graphic", "clickable", "visited"]
+names = ["OK", "Cancel", "Home", "Settings", "Sign in", "Search", "Total: $1,250.00", "Updated at 10:30", "Page 21st of March", "Size 2.5 MB"]
+
+def navigation(steps):
+	for step in range(steps):
+		sequence = [names[step*7 % len(names)], IndexCommand(step*3), roles[step % len(roles)], IndexCommand(step*3+1)]
+		if step % 3 == 0:
+			sequence += ["list item", "%d of 40" % (step % 40+1)]
+		if step % 5 == 0:
+			sequence += [PitchCommand(30), "H", PitchCommand(0), "ome"]
+		sequence.append(IndexCommand(step*3+2))
+		yield sequence
+
+def sayAll(steps):
+	for step in range(steps):
+		yield [IndexCommand(step), "Line %d of the report, it cost $%d.%02d at 10:%02d on the %dst, about %d km away. " % (step, step, step % 100, step % 60, step % 31+1, step*3)]
+
+def measure(ttusb, sequences):
+	dll = nvdastubs.FakeDll()
+	synth = nvdastubs.createSynth(ttusb, dll)
+	nvdastubs.waitForWrites(synth)
+	times = []
+	for sequence in sequences:
+		synth.cancel()
+		nvdastubs.waitForWrites(synth)
+		start = time.perf_counter()
+		synth.speak(sequence)
+		times.append(time.perf_counter()-start)
+		nvdastubs.waitForWrites(synth)
+	synth.terminate()
+	return times
+
+def main():
+	before = None
+	steps = 5000
+	for arg in sys.argv[1:]:
+		if arg.startswith("--before="):
+			before = arg.split("=", 1)[1]
+		elif arg.startswith("--steps="):
+			steps = int(arg.split("=", 1)[1])
+	nvdastubs.install()
+	for name, ttusb in (("before", nvdastubs.loadDriver(before or nvdastubs.baselineRev())), ("after", nvdastubs.loadDriver())):
+		for scenario, sequences in (("navigation", navigation), ("say all", sayAll)):
+			textCache = getattr(ttusb, "textCache", None)
+			if textCache:
+				ttusb.textCache = textCache = type(textCache)()
+			times = measure(ttusb, sequences(steps))
+			line = "%-7s %-11s speak p50 %7.1fus  p95 %7.1fus  total %8.1fms" % (name, scenario,
+				percentile(times, 0.5)*1000000, percentile(times, 0.95)*1000000, sum(times)*1000)
+			if textCache:
+				counters = textCache.counters()
+				line += "  hit rate %5.1f%%  average miss %5.1fus  %d entries" % (counters["hit rate"]*100, counters["average miss us"], counters["entries"])
+			print(line)
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
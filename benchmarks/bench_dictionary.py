@@ -0,0 +1,90 @@
+#benchmarks/bench_dictionary.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# How many characters a second go through the user pronunciation dictionary in synthDrivers/_ttdictionary.py with 10, 1,000 and 10,000 entries,
+# against going through the same entries one regex at a time, and how long the dictionary takes to compile when the synth loads.
+# A tenth of the entries are replaced anywhere and the rest only as whole words, about one word in twenty of the text has an entry.
+# normalize + dictionary is the whole of what happens to a string that isn't in the cache, for comparing with normalize alone.
+# Run it from anywhere with: python benchmarks/bench_dictionary.py [--sizes=10,1000,10000]
+
+import os
+import random
+import re
+import sys
+import time
+
+benchDir = os.path.dirname(os.path.abspath(__file__))
+rootDir = os.path.dirname(benchDir)
+sys.path.insert(0, os.path.join(rootDir, "synthDrivers"))
+from _ttdictionary import PronunciationDictionary
+from _ttnormalizer import normalize
+
+prose = ("It was the best of times, it was the worst of times, it was the age of wisdom, it cost $12.50 at 10:30 on the 21st "
+	"and the GUI in NVDA showed a widget with a tooltip next to the toolbar. ").split()
+
+def makeEntries(size, rng):
+	entries = [("gui", "gooey", True), ("nvda", "N V D A", True), ("tooltip", "tool tip", True)]
+	while len(entries) < size:
+		word = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for length in range(rng.randint(4, 10)))
+		entries.append((word, word.upper(), len(entries) % 10 != 0))
+	return entries[:size]
+
+def makeText(entries, rng, words=4000):
+	text = []
+	for count in range(words):
+		if count % 20 == 0:
+			text.append(rng.choice(entries)[0])
+		else:
+			text.append(prose[count % len(prose)])
+	# NVDA hands over a line at a time during say all
+	return [" ".join(text[start:start+15]) for start in range(0, len(text), 15)]
+
+class OneAtATime(object):
+	# what the dictionary would cost as a regex for each entry run one after the other
+	def __init__(self, entries):
+		self.regexes = [(re.compile((r"(?<!\w)%s(?!\w)" if wholeWord else "%s") % re.escape(pattern), re.IGNORECASE), replacement)
+			for pattern, replacement, wholeWord in entries]
+
+	def apply(self, text):
+		for regex, replacement in self.regexes:
+			text = regex.sub(replacement.replace("\\", "\\\\"), text)
+		return text
+
+def charsPerSecond(func, strings, minTime=0.5):
+	chars = sum(len(s) for s in strings)
+	loops = 0
+	start = time.perf_counter()
+	elapsed = 0
+	while elapsed < minTime:
+		for item in strings:
+			func(item)
+		loops += 1
+		elapsed = time.perf_counter()-start
+	return chars*loops/elapsed
+
+def main():
+	sizes = [10, 1000, 10000]
+	for arg in sys.argv[1:]:
+		if arg.startswith("--sizes="):
+			sizes = [int(size) for size in arg.split("=", 1)[1].split(",")]
+	rng = random.Random(1)
+	print("%-8s %12s %18s %18s %22s %18s" % ("entries", "compile", "dictionary", "one at a time", "normalize + dictionary", "normalize alone"))
+	for size in sizes:
+		entries = makeEntries(size, rng)
+		strings = makeText(entries, rng)
+		start = time.perf_counter()
+		dictionary = PronunciationDictionary(entries)
+		compileTime = time.perf_counter()-start
+		oneAtATime = OneAtATime(entries)
+		assert all(dictionary.apply(item) == oneAtATime.apply(item) for item in strings[:20] if size <= 1000) # the naive one doesn't pick the longest match when entries overlap
+		print("%-8d %10.1fms %12.0f chr/s %12.0f chr/s %16.0f chr/s %12.0f chr/s" % (size, compileTime*1000,
+			charsPerSecond(dictionary.apply, strings),
+			charsPerSecond(oneAtATime.apply, strings[:max(1, len(strings)*10//size)]),
+			charsPerSecond(lambda item: normalize(dictionary.apply(item)), strings),
+			charsPerSecond(normalize, strings)))
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
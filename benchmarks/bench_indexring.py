@@ -0,0 +1,118 @@
+#benchmarks/bench_indexring.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Pushes thousands of indexes through the emulated TT in ttemulator.py to see what happens once more than the TT's 100 are out at once,
+# for the driver in the working tree and the original driver from the first commit.
+# queued lines speaks a long run of short lines without waiting like a say all that gets ahead of the TT,
+# long utterances speaks utterances with more indexes than the TT has one at a time.
+# NVDA indexes only ever go up so any notification lower than the one before it is a wrong index, so is one sent before the TT started speaking the utterance it is in.
+# Since NVDA treats every index up to the one it is told about as reached the last index has to come back, and in long utterances the last index of every utterance.
+# Exits with 1 if the working tree driver reports an index out of order or before the TT got to its utterance, misses the end of an utterance,
+# or its ring had a stale index or gave up waiting for a free one.
+# Run it with: python benchmarks/bench_indexring.py [--speed=200] [--lines=400]
+
+import sys
+import time
+
+import nvdastubs
+from nvdastubs import IndexCommand
+from bench_latency import waitFor
+from ttemulator import TripleTalkEmulator
+
+def makeUtterance(number, indexes):
+	sequence = []
+	for chunk in range(indexes):
+		sequence.append(IndexCommand(number*1000+chunk))
+		sequence.append("word%d." % (chunk % 10))
+	return sequence
+
+def check(indexReached, emulator, lastIndexes, wait):
+	indexes = [call["index"] for call in indexReached.calls]
+	# the first utterance the TT gets is the one SynthDriver sends when it starts, utterance number n is the one after that
+	starts = emulator.utteranceEnds
+	result = {
+		"notifications": len(indexes),
+		"wrong order": sum(1 for before, after in zip(indexes, indexes[1:]) if after <= before),
+		"ahead of the TT": sum(1 for index, at in zip(indexes, indexReached.times) if at < starts[index//1000]),
+		"last index reported": int(bool(indexes) and indexes[-1] == lastIndexes[-1]),
+	}
+	if wait:
+		reported = set(indexes)
+		result["last indexes missing"] = sum(1 for index in lastIndexes if index not in reported)
+	return result
+
+def run(ttusb, speed, utterances, indexes, wait):
+	indexReached = sys.modules["synthDriverHandler"].synthIndexReached
+	doneSpeaking = sys.modules["synthDriverHandler"].synthDoneSpeaking
+	indexReached.clear()
+	doneSpeaking.clear()
+	emulator = TripleTalkEmulator(speed)
+	synth = nvdastubs.createSynth(ttusb, emulator)
+	lastIndexes = []
+	longestSpeak = 0
+	start = time.perf_counter()
+	for number in range(utterances):
+		sequence = makeUtterance(number, indexes)
+		lastIndexes.append(sequence[-2].index)
+		speakStart = time.perf_counter()
+		synth.speak(sequence)
+		longestSpeak = max(longestSpeak, time.perf_counter()-speakStart)
+		if wait:
+			waitFor(lambda: indexReached.calls and indexReached.calls[-1]["index"] >= lastIndexes[-1], 2)
+	waitFor(lambda: indexReached.calls and indexReached.calls[-1]["index"] >= lastIndexes[-1], 10)
+	waitFor(lambda: not emulator.isSpeaking(), 10)
+	time.sleep(0.05)
+	elapsed = time.perf_counter()-start
+	synth.terminate()
+	result = {"indexes sent by NVDA": utterances*indexes, "index commands written": sum(1 for index, at in emulator.reached)}
+	result.update(check(indexReached, emulator, lastIndexes, wait))
+	result["done speaking"] = len(doneSpeaking.calls)
+	result["longest speak ms"] = longestSpeak*1000
+	result["seconds"] = elapsed
+	if hasattr(ttusb, "indexRing"):
+		for key, value in ttusb.indexRing.counters().items():
+			result["ring " + key] = value
+	return result
+
+def failures(result):
+	found = []
+	for key in ("wrong order", "ahead of the TT", "last indexes missing", "ring stale", "ring timeouts"):
+		if result.get(key):
+			found.append("%s %d" % (key, result[key]))
+	if not result["last index reported"]:
+		found.append("last index not reported")
+	return found
+
+def main():
+	speed = 200.0
+	lines = 400
+	for arg in sys.argv[1:]:
+		if arg.startswith("--speed="):
+			speed = float(arg.split("=", 1)[1])
+		elif arg.startswith("--lines="):
+			lines = int(arg.split("=", 1)[1])
+	nvdastubs.install()
+	failed = []
+	for name, ttusb in (("before", nvdastubs.loadDriver(nvdastubs.baselineRev())), ("after", nvdastubs.loadDriver())):
+		if hasattr(ttusb, "rateCharsPerSecond"):
+			ttusb.rateCharsPerSecond = tuple(chars*speed for chars in ttusb.rateCharsPerSecond)
+		for scenario, utterances, indexes, wait in (("queued lines", lines, 8, False), ("long utterances", lines//20, 250, True)):
+			if hasattr(ttusb, "IndexRing"):
+				ttusb.indexRing = ttusb.IndexRing()
+			print("%s, %s" % (name, scenario))
+			result = run(ttusb, speed, utterances, indexes, wait)
+			for key, value in result.items():
+				if isinstance(value, float):
+					print("  %-24s %10.1f" % (key, value))
+				else:
+					print("  %-24s %10d" % (key, value))
+			if name == "after":
+				failed.extend("%s: %s" % (scenario, failure) for failure in failures(result))
+	for failure in failed:
+		print(failure)
+	return 1 if failed else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
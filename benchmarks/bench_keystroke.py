@@ -0,0 +1,68 @@
+#benchmarks/bench_keystroke.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Times typing echo: from the moment speak is handed a character in character mode until the last byte for it has been written to the dll.
+# The same keystrokes are run through the driver in the working tree and the original driver from the first commit for comparison.
+# The foreground window changes every switchEvery keystrokes like the user moving to another app, the driver should only ask the new one for its process.
+# Run it with: python benchmarks/bench_keystroke.py [--foreground-cost=microseconds] [--process-id-cost=microseconds]
+
+import sys
+import time
+
+import nvdastubs
+from nvdastubs import CharacterModeCommand, IndexCommand, PitchCommand, ForegroundObject
+
+switchEvery = 100
+
+typing = "The Quick brown fox, \xe9t\xe9 caf\xe9 “quoted” 1234—done."
+
+def keystrokes():
+	index = 0
+	for character in typing * 20:
+		index += 1
+		sequence = []
+		if character.isupper():
+			sequence.append(PitchCommand(30))
+		sequence += [CharacterModeCommand(True), character, CharacterModeCommand(False), IndexCommand(index)]
+		yield sequence
+
+def measure(ttusb):
+	dll = nvdastubs.FakeDll()
+	synth = nvdastubs.createSynth(ttusb, dll)
+	api = sys.modules["api"]
+	latencies = []
+	foregroundCalls = api.foregroundCalls
+	processIDCalls = api.processIDCalls
+	for count, sequence in enumerate(keystrokes()):
+		if count % switchEvery == 0:
+			api.foregroundObject = ForegroundObject(count//switchEvery % 2+1)
+		# NVDA interrupts speech for each typed character
+		synth.cancel()
+		nvdastubs.waitForWrites(synth)
+		start = time.perf_counter()
+		synth.speak(sequence)
+		nvdastubs.waitForWrites(synth)
+		latencies.append(dll.lastWriteTime-start)
+	foregroundCalls = api.foregroundCalls-foregroundCalls
+	processIDCalls = api.processIDCalls-processIDCalls
+	synth.terminate()
+	latencies.sort()
+	return latencies, foregroundCalls/len(latencies), processIDCalls/len(latencies)
+
+def main():
+	nvdastubs.install()
+	for arg in sys.argv[1:]:
+		if arg.startswith("--foreground-cost="):
+			sys.modules["api"].foregroundCost = float(arg.split("=", 1)[1])/1000000
+		elif arg.startswith("--process-id-cost="):
+			sys.modules["api"].processIDCost = float(arg.split("=", 1)[1])/1000000
+	for name, ttusb in (("before", nvdastubs.loadDriver(nvdastubs.baselineRev())), ("after", nvdastubs.loadDriver())):
+		latencies, foregroundCalls, processIDCalls = measure(ttusb)
+		print("%-7s median %6.1fus  p95 %6.1fus  max %7.1fus  per keystroke getForegroundObject calls %.1f processID lookups %.2f" % (name,
+			latencies[len(latencies)//2]*1000000, latencies[int(len(latencies)*0.95)]*1000000, latencies[-1]*1000000, foregroundCalls, processIDCalls))
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
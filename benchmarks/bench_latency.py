@@ -0,0 +1,251 @@
+#benchmarks/bench_latency.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Index, done speaking and cancel latency measured against the emulated TT in ttemulator.py, for the driver in the working tree and the original driver from the first commit
+# or the one from the git revision given with --before.
+# index lag is from when the TT reaches an index until NVDA is told about it, done speaking is from when the TT goes quiet until synthDoneSpeaking,
+# and cancel is from the call to cancel until the TT gets the flush.
+# interrupted long line is index lag and done speaking for something short said straight after cancelling a long line part way through.
+# cancel with say all pending is from when NVDA wants to cancel until the TT goes quiet, with a lot of speech still to be written to a TT that takes byteCost for every byte.  polls is how many times the index thread read from the TT each second, idle polls is the same once everything has been spoken.
+# Exits with 1 if in the long document the working tree driver misses any index or its lag grows, the last quarter more than maxLagGrowth behind the first.
+# Run it with: python benchmarks/bench_latency.py [--speed=10] [--lines=30] [--byte-cost=microseconds] [--before=rev]
+
+import sys
+import time
+
+import nvdastubs
+from nvdastubs import IndexCommand
+from ttemulator import TripleTalkEmulator
+
+maxLagGrowth = 0.005 # seconds, the polls land at different points in the TT's speech so the lag moves around by a few ms on its own
+
+words = "the quick brown fox jumps over the lazy dog while the cat sleeps by the warm fire ".split()
+
+def makeLine(lineNumber, indexes, chunkWords=6):
+	# a line of text with an index before every few words, like NVDA puts them between sentences and chunks
+	sequence = []
+	for chunk in range(indexes):
+		sequence.append(IndexCommand(lineNumber*100+chunk))
+		sequence.append(" ".join(words[(lineNumber+chunk) % 8:(lineNumber+chunk) % 8+chunkWords]) + ".")
+	return sequence
+
+def percentile(values, fraction):
+	if not values:
+		return float("nan")
+	values = sorted(values)
+	return values[min(len(values)-1, int(len(values)*fraction))]
+
+def waitFor(condition, timeout):
+	end = time.perf_counter()+timeout
+	while not condition() and time.perf_counter() < end:
+		time.sleep(0.001)
+
+def indexLags(lines, emulator, indexReached, sentinels):
+	# NVDA treats every index up to the one it is told about as reached, so each index counts as notified by the first notification at or after it.
+	# lines has the NVDA indexes of each utterance, a driver with sentinels sends one more index at the end of each that NVDA never hears about.
+	reachedTimes = {}
+	reached = iter(emulator.reached)
+	for line in lines:
+		for index in line:
+			ttIndex, at = next(reached, (None, None))
+			if at is not None:
+				reachedTimes[index] = at
+		if sentinels:
+			next(reached, None)
+	sent = [index for line in lines for index in line]
+	lags = []
+	notifications = list(zip(indexReached.calls, indexReached.times))
+	position = 0
+	for index in sent:
+		while position < len(notifications) and notifications[position][0]["index"] < index:
+			position += 1
+		if position == len(notifications) or index not in reachedTimes:
+			break
+		lags.append(notifications[position][1]-reachedTimes[index])
+	return lags
+
+def longDocument(ttusb, speed, lines):
+	# NVDA queues several lines of a long document at once with indexes only a couple of words apart,
+	# a driver that can't keep up with the indexes falls further behind with every line
+	indexReached = sys.modules["synthDriverHandler"].synthIndexReached
+	indexReached.clear()
+	emulator = TripleTalkEmulator(speed)
+	synth = nvdastubs.createSynth(ttusb, emulator)
+	sent = []
+	for lineNumber in range(lines):
+		sequence = makeLine(lineNumber, 8, 1)
+		sent.append([item.index for item in sequence if isinstance(item, IndexCommand)])
+		synth.speak(sequence)
+	waitFor(lambda: indexReached.calls and indexReached.calls[-1]["index"] == sent[-1][-1], 30)
+	synth.terminate()
+	lags = indexLags(sent, emulator, indexReached, hasattr(ttusb, "doneSpeakingIndex"))
+	quarter = max(1, len(lags)//4)
+	return {
+		"indexes sent": sum(len(line) for line in sent),
+		"notifications": len(indexReached.calls),
+		"indexes covered": len(lags),
+		"lag first quarter": sum(lags[:quarter])/quarter,
+		"lag last quarter": sum(lags[-quarter:])/quarter,
+	}
+
+def sayAll(ttusb, speed, lines):
+	indexReached = sys.modules["synthDriverHandler"].synthIndexReached
+	doneSpeaking = sys.modules["synthDriverHandler"].synthDoneSpeaking
+	indexReached.clear()
+	doneSpeaking.clear()
+	emulator = TripleTalkEmulator(speed)
+	synth = nvdastubs.createSynth(ttusb, emulator)
+	sent = []
+	doneLatencies = []
+	start = time.perf_counter()
+	for lineNumber in range(lines):
+		sequence = makeLine(lineNumber, 4)
+		sent.append([item.index for item in sequence if isinstance(item, IndexCommand)])
+		doneCount = len(doneSpeaking.times)
+		synth.speak(sequence)
+		# like NVDA, move on to the next line once the last index of this one comes back
+		waitFor(lambda: indexReached.calls and indexReached.calls[-1]["index"] == sent[-1][-1], 5)
+		waitFor(lambda: not emulator.isSpeaking(), 5)
+		waitFor(lambda: len(doneSpeaking.times) > doneCount, 0.3)
+		if len(doneSpeaking.times) > doneCount:
+			doneLatencies.append(doneSpeaking.times[doneCount]-emulator.utteranceEnds[-1])
+	elapsed = time.perf_counter()-start
+	lags = indexLags(sent, emulator, indexReached, hasattr(ttusb, "doneSpeakingIndex"))
+	# once the TT is quiet the index thread should be too
+	idleReads = emulator.reads
+	idleTime = 0.5
+	time.sleep(idleTime)
+	idleReads = emulator.reads-idleReads
+	# cancel in the middle of a long utterance with more waiting to be written
+	cancelLatencies = []
+	for attempt in range(5):
+		synth.speak(makeLine(attempt, 40))
+		time.sleep(0.02)
+		flushes = len(emulator.flushes)
+		cancelStart = time.perf_counter()
+		synth.cancel()
+		waitFor(lambda: len(emulator.flushes) > flushes, 2)
+		if len(emulator.flushes) > flushes:
+			cancelLatencies.append(emulator.flushes[flushes]-cancelStart)
+	synth.terminate()
+	return {
+		"indexes sent": sum(len(line) for line in sent),
+		"indexes covered": len(lags),
+		"index lag p50": percentile(lags, 0.5),
+		"index lag p95": percentile(lags, 0.95),
+		"index lag max": percentile(lags, 1.0),
+		"done speaking p50": percentile(doneLatencies, 0.5),
+		"done speaking notified": len(doneLatencies),
+		"cancel p50": percentile(cancelLatencies, 0.5),
+		"polls per second": emulator.reads/elapsed,
+		"empty polls per second": emulator.emptyReads/elapsed,
+		"idle polls per second": idleReads/idleTime,
+	}
+
+def interrupted(ttusb, speed):
+	# Moving around quickly, NVDA cancels a long line part way through and says something short in its place, then waits to hear its index came back
+	# before it sends anything else.  The index thread can be asleep waiting for an index in the long line when that happens.
+	indexReached = sys.modules["synthDriverHandler"].synthIndexReached
+	doneSpeaking = sys.modules["synthDriverHandler"].synthDoneSpeaking
+	emulator = TripleTalkEmulator(speed)
+	synth = nvdastubs.createSynth(ttusb, emulator)
+	longLine = " ".join(words)*max(1, int(2.5*speed)) # as long to say as about 200 characters on a real TT
+	lags = []
+	doneLatencies = []
+	for attempt in range(8):
+		synth.speak([IndexCommand(attempt*2), longLine])
+		time.sleep(0.05 if attempt % 2 else 0.3)
+		synth.cancel()
+		indexReached.clear()
+		doneSpeaking.clear()
+		reached = len(emulator.reached)
+		synth.speak(["ok", IndexCommand(attempt*2+1)])
+		waitFor(lambda: doneSpeaking.calls or not hasattr(ttusb, "doneSpeakingIndex") and indexReached.calls, 2)
+		if indexReached.calls and len(emulator.reached) > reached:
+			lags.append(indexReached.times[0]-emulator.reached[reached][1])
+		if doneSpeaking.calls:
+			doneLatencies.append(doneSpeaking.times[0]-emulator.utteranceEnds[-1])
+		synth.cancel()
+	synth.terminate()
+	return {
+		"index lag p50": percentile(lags, 0.5),
+		"index lag max": percentile(lags, 1.0),
+		"done speaking p50": percentile(doneLatencies, 0.5),
+		"done speaking max": percentile(doneLatencies, 1.0),
+	}
+
+def cancelPending(ttusb, speed, byteCost):
+	# NVDA hands over a long run of say all lines and the user presses control part way through writing them,
+	# NVDA can't call cancel until speak returns so the time from wanting to cancel counts whatever speak is still doing
+	latencies = []
+	bytesAfter = []
+	for attempt in range(5):
+		emulator = TripleTalkEmulator(speed, byteCost=byteCost)
+		synth = nvdastubs.createSynth(ttusb, emulator)
+		lines = [makeLine(attempt*30+lineNumber, 2, 30) for lineNumber in range(30)]
+		cancelAt = time.perf_counter()+0.05
+		for sequence in lines:
+			synth.speak(sequence)
+			if time.perf_counter() >= cancelAt:
+				break
+		while time.perf_counter() < cancelAt:
+			time.sleep(0.001)
+		flushes = len(emulator.flushes)
+		written = emulator.bytesWritten
+		synth.cancel()
+		waitFor(lambda: len(emulator.flushes) > flushes, 10)
+		if len(emulator.flushes) > flushes:
+			latencies.append(emulator.flushes[flushes]-cancelAt)
+		time.sleep(0.05)
+		# anything written after the flush was still queued when the TT went quiet
+		bytesAfter.append(emulator.bytesWritten-written)
+		synth.terminate()
+	return {
+		"cancel to quiet p50": percentile(latencies, 0.5),
+		"cancel to quiet max": percentile(latencies, 1.0),
+		"bytes written on cancel": max(bytesAfter),
+	}
+
+def main():
+	speed = 10.0
+	lines = 30
+	byteCost = 0.00005
+	before = None
+	for arg in sys.argv[1:]:
+		if arg.startswith("--speed="):
+			speed = float(arg.split("=", 1)[1])
+		elif arg.startswith("--lines="):
+			lines = int(arg.split("=", 1)[1])
+		elif arg.startswith("--byte-cost="):
+			byteCost = float(arg.split("=", 1)[1])/1000000
+		elif arg.startswith("--before="):
+			before = arg.split("=", 1)[1]
+	nvdastubs.install()
+	failed = []
+	for name, ttusb in (("before", nvdastubs.loadDriver(before or nvdastubs.baselineRev())), ("after", nvdastubs.loadDriver())):
+		if hasattr(ttusb, "rateCharsPerSecond"):
+			# the emulator talks speed times faster than a real TT so the driver's idea of how fast the TT talks has to be sped up the same
+			ttusb.rateCharsPerSecond = tuple(chars*speed for chars in ttusb.rateCharsPerSecond)
+		for scenario, result in (("say all", sayAll(ttusb, speed, lines)), ("long document", longDocument(ttusb, speed, 10)),
+				("interrupted long line", interrupted(ttusb, speed)), ("cancel with say all pending", cancelPending(ttusb, speed, byteCost))):
+			print("%s, %s" % (name, scenario))
+			for key, value in result.items():
+				if isinstance(value, float) and "per second" not in key:
+					print("  %-24s %8.1fms" % (key, value*1000))
+				elif isinstance(value, float):
+					print("  %-24s %8.1f" % (key, value))
+				else:
+					print("  %-24s %8d" % (key, value))
+			if name == "after" and scenario == "long document":
+				if result["indexes covered"] < result["indexes sent"]:
+					failed.append("%d of %d indexes in the long document never reached NVDA" % (result["indexes sent"]-result["indexes covered"], result["indexes sent"]))
+				if result["lag last quarter"]-result["lag first quarter"] > maxLagGrowth:
+					failed.append("index lag grew by %.1fms over the long document" % ((result["lag last quarter"]-result["lag first quarter"])*1000))
+	for failure in failed:
+		print(failure)
+	return 1 if failed else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,60 @@
+#benchmarks/bench_metrics.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Runs some navigation and a short say all through the emulated TT in ttemulator.py and prints what SynthDriver.logMetrics would put in the NVDA log,
+# then checks the counters the driver keeps against what the emulator saw.
+# Run it with: python benchmarks/bench_metrics.py [--speed=20] [--steps=200]
+
+import sys
+
+import nvdastubs
+from nvdastubs import CharacterModeCommand, IndexCommand, PitchCommand
+from bench_latency import waitFor
+from ttemulator import TripleTalkEmulator
+
+def navigation(steps):
+	for step in range(steps):
+		if step % 3 == 0:
+			yield [PitchCommand(30), CharacterModeCommand(True), "H", CharacterModeCommand(False), PitchCommand(0), IndexCommand(step)]
+		else:
+			yield ["button", IndexCommand(step), "Item %d of 40" % (step % 40+1), IndexCommand(step+100000)]
+
+def sayAll(lines):
+	for line in range(lines):
+		yield [IndexCommand(200000+line), "Line %d of the report, it cost $12.%02d at 10:30 on the 21st. " % (line, line)]
+
+def main():
+	speed = 20.0
+	steps = 200
+	for arg in sys.argv[1:]:
+		if arg.startswith("--speed="):
+			speed = float(arg.split("=", 1)[1])
+		elif arg.startswith("--steps="):
+			steps = int(arg.split("=", 1)[1])
+	nvdastubs.install()
+	ttusb = nvdastubs.loadDriver()
+	ttusb.rateCharsPerSecond = tuple(chars*speed for chars in ttusb.rateCharsPerSecond)
+	emulator = TripleTalkEmulator(speed)
+	synth = nvdastubs.createSynth(ttusb, emulator)
+	for sequence in navigation(steps):
+		synth.cancel()
+		synth.speak(sequence)
+		waitFor(lambda: not ttusb.indexRing.outstanding, 1)
+	synth.cancel()
+	for sequence in sayAll(steps//4):
+		synth.speak(sequence)
+	waitFor(lambda: not ttusb.indexRing.outstanding, 10)
+	nvdastubs.waitForWrites(synth)
+	print(ttusb.metrics.report(synth.getMetrics()["counters"]))
+	counters = synth.getMetrics()["counters"]
+	print("\nemulator: bytes written %d, immediate bytes %d, reads %d" % (emulator.bytesWritten, emulator.immediateBytes, emulator.reads))
+	synth.terminate()
+	if counters["bytes written"] != emulator.bytesWritten or counters["immediate bytes"] != emulator.immediateBytes:
+		print("the driver's byte counts don't match the emulator")
+		return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
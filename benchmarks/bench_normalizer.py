@@ -0,0 +1,65 @@
+#benchmarks/bench_normalizer.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Checks that synthDrivers/_ttnormalizer.py says problem_speech.txt exactly the way the old loop in SynthDriver.speak did
+# and prints how many characters a second each of them gets through.
+# Run it from anywhere with: python benchmarks/bench_normalizer.py
+
+import os
+import sys
+import time
+
+benchDir = os.path.dirname(os.path.abspath(__file__))
+rootDir = os.path.dirname(benchDir)
+sys.path.insert(0, os.path.join(rootDir, "synthDrivers"))
+sys.path.insert(0, benchDir)
+from _ttnormalizer import normalize
+from legacy_normalizer import legacyNormalize
+
+def loadProblemSpeech():
+	with open(os.path.join(rootDir, "problem_speech.txt"), encoding="utf-8") as f:
+		return f.read()
+
+def runStrings(func, strings):
+	# NVDA hands speak one string per line during say all so carry previousMetric along the way speak does
+	previousMetric = False
+	result = []
+	for item in strings:
+		item, previousMetric = func(item, previousMetric)
+		result.append(item)
+	return result
+
+def charsPerSecond(func, strings, minTime=1.0):
+	chars = sum(len(s) for s in strings)
+	loops = 0
+	start = time.perf_counter()
+	elapsed = 0
+	while elapsed < minTime:
+		runStrings(func, strings)
+		loops += 1
+		elapsed = time.perf_counter()-start
+	return chars*loops/elapsed
+
+def main():
+	text = loadProblemSpeech()
+	lines = text.splitlines()
+	mismatches = 0
+	for strings in (lines, [text], [line + "  " for line in lines]):
+		if runStrings(normalize, strings) != runStrings(legacyNormalize, strings):
+			mismatches += 1
+	if mismatches:
+		print("normalizer output differs from the old speak loop")
+		return 1
+	print("problem_speech.txt output identical")
+	prose = ("The quick brown fox jumps over the lazy dog, and then it runs away. " * 40).splitlines()
+	sheet = ["%d,%03d.%02d  %d:%02d  $%d.%02d  %dth" % (i, i%1000, i%100, i%12, i%60, i, i%100, i) for i in range(1, 400)]
+	for name, strings in (("problem_speech.txt", lines), ("prose", prose), ("spreadsheet", sheet)):
+		before = charsPerSecond(legacyNormalize, strings)
+		after = charsPerSecond(normalize, strings)
+		print("%-20s before %12.0f chars/sec  after %12.0f chars/sec  %.1fx" % (name, before, after, after/before))
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,77 @@
+#benchmarks/bench_scaling.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Stress inputs for the normalizer: long comma separated numbers, zero runs, money amounts, space runs after numbers and so on.
+# Every input is timed at several sizes and the growth between the smallest and largest is turned into an exponent, 1 is linear and 2 is quadratic.
+# Exits with 1 if anything grows faster than maxExponent so it can be used to catch a change that makes the normalizer superlinear.
+# Run it with: python benchmarks/bench_scaling.py [--legacy]
+
+import math
+import os
+import sys
+import time
+
+benchDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(benchDir), "synthDrivers"))
+sys.path.insert(0, benchDir)
+from _ttnormalizer import normalize
+from legacy_normalizer import legacyNormalize
+
+sizes = (25000, 50000, 100000, 200000)
+maxExponent = 1.3
+
+def repeat(pattern, size):
+	return (pattern * (size//len(pattern)+1))[:size]
+
+stressInputs = (
+	("csv digits", lambda size: repeat("1,2,3,4,", size)),
+	("thousands", lambda size: "1" + repeat(",234", size)),
+	("comma runs", lambda size: "1" + repeat(",", size)),
+	("zero words", lambda size: repeat("0 ", size)),
+	("zero run", lambda size: " " + repeat("0", size) + "1 x"),
+	("zero run time", lambda size: " " + repeat("0", size) + ":"),
+	("money digits", lambda size: "$" + repeat("1", size) + " dollars"),
+	("money cents", lambda size: "$1." + repeat("0", size//2) + repeat("7", size//2)),
+	("money commas", lambda size: "$" + repeat("1,2", size) + ".25"),
+	("dollar signs", lambda size: repeat("$", size)),
+	("money words", lambda size: repeat("$5 by ", size)),
+	("number spaces", lambda size: "5" + repeat(" ", size) + "6"),
+	("number space end", lambda size: "5" + repeat(" ", size)),
+	("spaces ordinal", lambda size: "5" + repeat(" ", size) + "th"),
+	("ordinals", lambda size: repeat("5 th ", size)),
+	("times", lambda size: repeat("10:00:00 ", size)),
+	("colons", lambda size: repeat(":0", size)),
+	("decimals", lambda size: repeat("3.000 ", size)),
+	("control chars", lambda size: repeat("1\t$\n0.", size)),
+	("prose", lambda size: repeat("The quick brown fox jumps over the lazy dog 21 times. ", size)),
+)
+
+def timeInput(func, text):
+	best = None
+	for i in range(3):
+		start = time.perf_counter()
+		func(text)
+		elapsed = time.perf_counter()-start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+def main():
+	func = legacyNormalize if "--legacy" in sys.argv else normalize
+	failed = []
+	print("%-18s %s  exponent" % ("input", "  ".join("%9d" % size for size in sizes)))
+	for name, make in stressInputs:
+		times = [timeInput(func, make(size)) for size in sizes]
+		exponent = math.log(times[-1]/times[0])/math.log(sizes[-1]/sizes[0])
+		print("%-18s %s  %.2f" % (name, "  ".join("%7.2fms" % (t*1000) for t in times), exponent))
+		if exponent > maxExponent:
+			failed.append(name)
+	if failed:
+		print("superlinear: %s" % ", ".join(failed))
+		return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,56 @@
+#benchmarks/bench_speak.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Measures how long NVDA's main thread spends inside speak during say all, for the driver in the working tree and the original driver from the first commit.
+# The stand in dll spins for a few microseconds on every byte like a real USB driver, so a driver that writes from speak pays for every byte on the main thread.
+# Run it with: python benchmarks/bench_speak.py [--byte-cost=microseconds]
+
+import sys
+import time
+
+import nvdastubs
+from nvdastubs import IndexCommand
+from bench_latency import waitFor
+
+prose = ("It was the best of times, it was the worst of times, it was the age of wisdom, it was the age of foolishness, "
+	"it was the epoch of belief, it was the epoch of incredulity, it was the season of Light, it was the season of Darkness.")
+
+def sayAll(lines=60):
+	for line in range(lines):
+		yield [prose[:60+line*2], IndexCommand(line*2), prose[60+line*2:], IndexCommand(line*2+1)]
+
+def measure(ttusb, byteCost):
+	dll = nvdastubs.FakeDll(byteCost)
+	synth = nvdastubs.createSynth(ttusb, dll)
+	times = []
+	for sequence in sayAll():
+		start = time.perf_counter()
+		synth.speak(sequence)
+		times.append(time.perf_counter()-start)
+		nvdastubs.waitForWrites(synth) # the synth is speaking the line, NVDA sends the next one later
+		if hasattr(ttusb, "indexRing"):
+			# and only once the line's indexes have come back, otherwise the driver would be left waiting for the TT to catch up
+			waitFor(lambda: not ttusb.indexRing.outstanding, 2)
+	synth.terminate()
+	times.sort()
+	return times, len(dll.written)
+
+def main():
+	byteCost = 0.000005
+	for arg in sys.argv[1:]:
+		if arg.startswith("--byte-cost="):
+			byteCost = float(arg.split("=", 1)[1])/1000000
+	nvdastubs.install()
+	for name, ttusb in (("before", nvdastubs.loadDriver(nvdastubs.baselineRev())), ("after", nvdastubs.loadDriver())):
+		if hasattr(ttusb, "rateCharsPerSecond"):
+			# the stand in dll says everything the moment it gets it
+			ttusb.rateCharsPerSecond = tuple(chars*1000 for chars in ttusb.rateCharsPerSecond)
+		times, written = measure(ttusb, byteCost)
+		print("%-7s main thread in speak: median %8.1fus  p95 %8.1fus  total %7.2fms  bytes written %d" % (name,
+			times[len(times)//2]*1000000, times[int(len(times)*0.95)]*1000000, sum(times)*1000, written))
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,61 @@
+#benchmarks/bench_streaming.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# How long the TT waits before it can start talking when NVDA hands over one long sequence, for the driver in the working tree
+# and the original driver from the first commit or the one from the git revision given with --before.
+# first byte is from the call to speak until the emulated TT in ttemulator.py gets the first byte of it,
+# first carriage return is until it gets the first carriage return, which is when the TT starts talking, and speak is how long speak took.
+# Run it with: python benchmarks/bench_streaming.py [--before=rev]
+
+import sys
+import time
+
+import nvdastubs
+from nvdastubs import IndexCommand
+from ttemulator import TripleTalkEmulator
+
+prose = ("It was the best of times, it was the worst of times, it was the age of wisdom, it was the age of foolishness, "
+	"it cost $12.50 at 10:30, the 21st of 1,000 tries. ")
+
+def makeSequence(size):
+	# strings of a sentence or so like NVDA sends for say all, with an index every 20 KB
+	sequence = []
+	length = 0
+	while length < size:
+		if length % 20000 < len(prose):
+			sequence.append(IndexCommand(len(sequence)))
+		sequence.append(prose)
+		length += len(prose)
+	return sequence
+
+def measure(ttusb, size):
+	emulator = TripleTalkEmulator()
+	synth = nvdastubs.createSynth(ttusb, emulator)
+	sequence = makeSequence(size)
+	emulator.firstWrite = 0
+	start = time.perf_counter()
+	synth.speak(sequence)
+	speakTime = time.perf_counter()-start
+	nvdastubs.waitForWrites(synth)
+	firstReturn = next(at for at in emulator.carriageReturns if at >= start)
+	synth.cancel()
+	synth.terminate()
+	return emulator.firstWrite-start, firstReturn-start, speakTime
+
+def main():
+	before = None
+	for arg in sys.argv[1:]:
+		if arg.startswith("--before="):
+			before = arg.split("=", 1)[1]
+	nvdastubs.install()
+	for name, ttusb in (("before", nvdastubs.loadDriver(before or nvdastubs.baselineRev())), ("after", nvdastubs.loadDriver())):
+		for size in (1000, 100000, 1000000):
+			firstByte, firstReturn, speakTime = measure(ttusb, size)
+			print("%-7s %8d bytes  first byte %9.2fms  first carriage return %9.2fms  speak %9.2fms" % (name, size,
+				firstByte*1000, firstReturn*1000, speakTime*1000))
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,94 @@
+#benchmarks/bench_thinning.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Say all of a document with an index before every word or two against the emulated TT in ttemulator.py with indexMergeBytes at a few distances.
+# Shows how many bytes and index commands reach the TT and how often the index thread reads from it, against how late NVDA hears about the indexes,
+# lag is from when the TT reaches the text an index was put in front of until NVDA is told about that index or one after it.
+# Run it with: python benchmarks/bench_thinning.py [--speed=10] [--lines=10] [--distances=0,8,16,32,64]
+
+import sys
+import time
+
+import nvdastubs
+from nvdastubs import IndexCommand
+from bench_latency import waitFor, percentile
+from ttemulator import TripleTalkEmulator, charsPerSecond
+
+words = "the quick brown fox jumps over the lazy dog while a cat sleeps by the warm fire".split()
+
+def makeLine(lineNumber, chunks):
+	sequence = []
+	for chunk in range(chunks):
+		sequence.append(IndexCommand(lineNumber*1000+chunk))
+		sequence.append(" ".join(words[(lineNumber+chunk) % 8:(lineNumber+chunk) % 8+1+chunk % 2]) + " ")
+	return sequence
+
+def run(ttusb, speed, lines, distance):
+	indexReached = sys.modules["synthDriverHandler"].synthIndexReached
+	indexReached.clear()
+	ttusb.indexMergeBytes = distance
+	ttusb.indexRing = ttusb.IndexRing()
+	emulator = TripleTalkEmulator(speed)
+	synth = nvdastubs.createSynth(ttusb, emulator)
+	# the driver sends its own rate and voice with the first utterance so the TT talks at those, not the ones it starts up with
+	charRate = charsPerSecond(synth.tt_rate, int(synth.tt_variant))*speed
+	# when the TT gets to each NVDA index, worked out from the text in front of it since the emulator only knows about the indexes that were sent
+	due = {}
+	start = time.perf_counter()
+	for lineNumber in range(lines):
+		sequence = makeLine(lineNumber, 20)
+		lineStart = max(time.perf_counter(), emulator.busyUntil)
+		chars = 0
+		for item in sequence:
+			if isinstance(item, IndexCommand):
+				due[item.index] = lineStart+chars/charRate
+			else:
+				chars += len(item)
+		synth.speak(sequence)
+		last = sequence[-2].index
+		waitFor(lambda: indexReached.calls and indexReached.calls[-1]["index"] == last, 5)
+	elapsed = time.perf_counter()-start
+	synth.terminate()
+	lags = []
+	notifications = list(zip(indexReached.calls, indexReached.times))
+	position = 0
+	for index in sorted(due):
+		while position < len(notifications) and notifications[position][0]["index"] < index:
+			position += 1
+		if position == len(notifications):
+			break
+		lags.append(notifications[position][1]-due[index])
+	return {
+		"bytes written": emulator.bytesWritten,
+		"index commands": len(emulator.reached),
+		"immediate bytes": emulator.immediateBytes,
+		"reads per second": emulator.reads/elapsed,
+		"notifications": len(indexReached.calls),
+		"lag p50 ms": percentile(lags, 0.5)*1000,
+		"lag p95 ms": percentile(lags, 0.95)*1000,
+	}
+
+def main():
+	speed = 10.0
+	lines = 10
+	distances = [0, 8, 16, 32, 64]
+	for arg in sys.argv[1:]:
+		if arg.startswith("--speed="):
+			speed = float(arg.split("=", 1)[1])
+		elif arg.startswith("--lines="):
+			lines = int(arg.split("=", 1)[1])
+		elif arg.startswith("--distances="):
+			distances = [int(distance) for distance in arg.split("=", 1)[1].split(",")]
+	nvdastubs.install()
+	ttusb = nvdastubs.loadDriver()
+	ttusb.rateCharsPerSecond = tuple(chars*speed for chars in ttusb.rateCharsPerSecond)
+	print("%-10s %10s %10s %10s %10s %10s %10s %10s" % ("distance", "bytes", "indexes", "immediate", "reads/s", "notified", "lag p50", "lag p95"))
+	for distance in distances:
+		result = run(ttusb, speed, lines, distance)
+		print("%-10d %10d %10d %10d %10.1f %10d %8.1fms %8.1fms" % ((distance,)+tuple(result.values())))
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,57 @@
+#benchmarks/bench_trace.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# What the trace recorder in synthDrivers/_tttrace.py costs: speak times for navigation with NVDA cancelling before each utterance, against the emulated TT
+# in ttemulator.py, with the recorder off and then on, and how many events it caught.  The trace from the run with it on is written to --out,
+# ttusb-trace.json in the temp directory unless it is given, so there is something to open in chrome://tracing or https://ui.perfetto.dev.
+# Run it with: python benchmarks/bench_trace.py [--steps=2000] [--out=ttusb-trace.json]
+
+import os
+import sys
+import tempfile
+import time
+
+import nvdastubs
+from nvdastubs import IndexCommand
+from bench_latency import percentile
+from ttemulator import TripleTalkEmulator
+
+def measure(ttusb, steps, trace, out):
+	emulator = TripleTalkEmulator(50)
+	synth = nvdastubs.createSynth(ttusb, emulator)
+	if trace:
+		synth.startTrace()
+	times = []
+	for step in range(steps):
+		synth.cancel()
+		start = time.perf_counter()
+		synth.speak(["Item %d of 40" % (step % 40+1), IndexCommand(step), "button", IndexCommand(step+100000)])
+		times.append(time.perf_counter()-start)
+		time.sleep(0.0005)
+	events = len(ttusb.tracer.events) if trace else 0
+	if trace:
+		synth.stopTrace(out)
+	synth.terminate()
+	return times, events
+
+def main():
+	steps = 2000
+	out = os.path.join(tempfile.gettempdir(), "ttusb-trace.json")
+	for arg in sys.argv[1:]:
+		if arg.startswith("--steps="):
+			steps = int(arg.split("=", 1)[1])
+		elif arg.startswith("--out="):
+			out = arg.split("=", 1)[1]
+	nvdastubs.install()
+	ttusb = nvdastubs.loadDriver()
+	ttusb.rateCharsPerSecond = tuple(chars*50 for chars in ttusb.rateCharsPerSecond)
+	for name, trace in (("off", False), ("on", True)):
+		times, events = measure(ttusb, steps, trace, out)
+		print("trace %-4s speak p50 %7.1fus  p95 %7.1fus  events %d" % (name, percentile(times, 0.5)*1000000, percentile(times, 0.95)*1000000, events))
+	print("trace written to %s" % out)
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
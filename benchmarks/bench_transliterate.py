@@ -0,0 +1,78 @@
+#benchmarks/bench_transliterate.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# How many characters a second get turned into bytes for the TT, the old way with encode('ascii', 'replace')
+# against toAscii from synthDrivers/_ttnormalizer.py followed by encode, on lines of English, French, German, Spanish, Polish, Vietnamese
+# and Japanese with smart quotes and dashes like a web page or a word processor hands NVDA.
+# cold is the first pass with nothing worked out yet for the characters outside the table, warm is once they all have been.
+# Also counts how many question marks each way sends the TT that weren't in the text.
+# Run it from anywhere with: python benchmarks/bench_transliterate.py
+
+import os
+import sys
+import time
+
+benchDir = os.path.dirname(os.path.abspath(__file__))
+rootDir = os.path.dirname(benchDir)
+sys.path.insert(0, os.path.join(rootDir, "synthDrivers"))
+import _ttnormalizer
+from _ttnormalizer import toAscii
+
+corpus = [
+	"The quick brown fox jumps over the lazy dog, it cost $12.50 at 10:30.",
+	"“It’s done” — she said – and that was that…",
+	"Le café naïf où l’on a déjà mangé une crème brûlée à 7 €.",
+	"Die Straße führt über die Brücke, Ärger gab es öfter »heute«.",
+	"¿Dónde está el niño? ¡Mañana será otro día!",
+	"Zażółć gęślą jaźń, Łódź leży w Polsce.",
+	"Tiếng Việt có nhiều dấu, Việt Nam đẹp lắm.",
+	"東京で会いましょう (Tokyo), 25°C × 2 ½ cup • item",
+]
+
+def oldWay(text):
+	return text.encode('ascii', 'replace')
+
+def newWay(text):
+	return toAscii(text).encode('ascii')
+
+def charsPerSecond(func, strings, minTime=1.0):
+	chars = sum(len(s) for s in strings)
+	loops = 0
+	start = time.perf_counter()
+	elapsed = 0
+	while elapsed < minTime:
+		for item in strings:
+			func(item)
+		loops += 1
+		elapsed = time.perf_counter()-start
+	return chars*loops/elapsed
+
+def coldCharsPerSecond(strings):
+	table = _ttnormalizer.asciiTable
+	fresh = type(table)((code, chr(code)) for code in range(128))
+	_ttnormalizer.asciiTable = fresh
+	try:
+		start = time.perf_counter()
+		for item in strings:
+			newWay(item)
+		elapsed = time.perf_counter()-start
+	finally:
+		_ttnormalizer.asciiTable = table
+	return sum(len(s) for s in strings)/elapsed, len(fresh)-128
+
+def main():
+	strings = corpus*50
+	questionMarks = sum(item.count("?") for item in corpus)
+	print("%-28s %14s %18s" % ("", "chars/second", "unwanted ? marks"))
+	print("%-28s %14.0f %18d" % ("encode('ascii', 'replace')", charsPerSecond(oldWay, strings), sum(oldWay(item).count(b"?") for item in corpus)-questionMarks))
+	cold, worked = coldCharsPerSecond(corpus)
+	print("%-28s %14.0f %18s  (%d characters worked out)" % ("toAscii cold", cold, "", worked))
+	print("%-28s %14.0f %18d" % ("toAscii warm", charsPerSecond(newWay, strings), sum(newWay(item).count(b"?") for item in corpus)-questionMarks))
+	for item in corpus:
+		print("  " + newWay(item).decode())
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,94 @@
+#benchmarks/bench_wirebytes.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# How many bytes and parameter commands reach the dll while navigating, for the driver in the working tree
+# and the original driver from the first commit or the one from the git revision given with --before.
+# The navigation is moving through a list, by character over words with capitals, spelling, and reading controls,
+# with NVDA interrupting speech before each one, a few rate changes that round to the same TT rate, a pitch change now and then, and a switch to another app now and then.
+# Exits with 1 if the working tree driver sends a ctrl-A that isn't a well formed command, digits and a letter.
+# Every fourth one is interrupted before the TT has finished it.
+# Run it with: python benchmarks/bench_wirebytes.py [--before=rev] [--steps=2000]
+
+import re
+import sys
+
+import nvdastubs
+from nvdastubs import CharacterModeCommand, IndexCommand, PitchCommand, ForegroundObject
+from bench_latency import waitFor
+
+command = re.compile(rb"\x01(\d+)([a-z])")
+
+def capital(character):
+	return [PitchCommand(30), CharacterModeCommand(True), character, CharacterModeCommand(False), PitchCommand(0)]
+
+def navigation(steps):
+	index = 0
+	for step in range(steps):
+		kind = step % 5
+		index += 1
+		if kind == 0:
+			yield ["Item %d of 40" % (step % 40+1), IndexCommand(index)]
+		elif kind == 1:
+			character = "Hello World"[step % 11]
+			if character.isupper():
+				yield capital(character)+[IndexCommand(index)]
+			else:
+				yield [CharacterModeCommand(True), character, CharacterModeCommand(False), IndexCommand(index)]
+		elif kind == 2:
+			# spelling a word, NVDA puts the pitch back after each capital and raises it again for the next
+			yield capital("N")+capital("V")+capital("D")+capital("A")+[IndexCommand(index)]
+		elif kind == 3:
+			yield ["button", "OK", IndexCommand(index)]
+		else:
+			yield ["link", PitchCommand(30), "H", PitchCommand(0), "ome", IndexCommand(index)]
+
+def measure(ttusb, steps):
+	api = sys.modules["api"]
+	dll = nvdastubs.FakeDll()
+	synth = nvdastubs.createSynth(ttusb, dll)
+	nvdastubs.waitForWrites(synth)
+	start = len(dll.written)
+	for step, sequence in enumerate(navigation(steps)):
+		if step % 200 == 100:
+			api.foregroundObject = ForegroundObject(step//200 % 2+1)
+		if step % 300 == 150:
+			synth._set_rate(41 if synth._get_rate() != 41 else 43) # NVDA goes through the rate property, the stub SynthDriver has no properties
+		if step % 500 == 250:
+			synth._set_pitch(60 if synth._get_pitch() != 60 else 50)
+		synth.cancel()
+		synth.speak(sequence)
+		nvdastubs.waitForWrites(synth)
+		if step % 4 and hasattr(ttusb, "indexRing"):
+			waitFor(lambda: not ttusb.indexRing.outstanding, 1)
+	synth.terminate()
+	written = bytes(dll.written[start:])
+	counts = {}
+	for value, letter in command.findall(written):
+		counts[letter.decode()] = counts.get(letter.decode(), 0)+1
+	# every ctrl-A has to start a command the TT understands, anything else like \x0160.0p gets spoken or garbles the next command
+	malformed = written.count(b"\x01")-sum(counts.values())
+	return len(written), counts, malformed
+
+def main():
+	before = None
+	steps = 2000
+	for arg in sys.argv[1:]:
+		if arg.startswith("--before="):
+			before = arg.split("=", 1)[1]
+		elif arg.startswith("--steps="):
+			steps = int(arg.split("=", 1)[1])
+	nvdastubs.install()
+	for name, ttusb in (("before", nvdastubs.loadDriver(before or nvdastubs.baselineRev())), ("after", nvdastubs.loadDriver())):
+		if hasattr(ttusb, "rateCharsPerSecond"):
+			# the stand in dll says everything the moment it gets it
+			ttusb.rateCharsPerSecond = tuple(chars*1000 for chars in ttusb.rateCharsPerSecond)
+		sys.modules["api"].foregroundObject = ForegroundObject()
+		written, counts, malformed = measure(ttusb, steps)
+		print("%-7s %8d bytes  %6.1f per utterance  commands %s  malformed %d" % (name, written, written/steps,
+			"  ".join("%s %d" % (letter, counts.get(letter, 0)) for letter in "osepvi"), malformed))
+	return 1 if malformed else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,164 @@
+#benchmarks/fuzz_normalizer.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Differential fuzzing of synthDrivers/_ttnormalizer.py against the old loop from SynthDriver.speak kept in legacy_normalizer.py.
+# Every input is run through both and anything that comes out different, the text or previousMetric, is cut down to the smallest input that still
+# differs by throwing away strings and then runs of characters until nothing more can go, and printed so it can be added to problem_speech.txt.
+# The inputs come in classes, random strings made of the characters that start a fixup and built ones for times, money, ordinals, numbers with commas and points,
+# metric units, unicode digits, and the same cut into two to four strings so previousMetric gets carried from one to the next the way speak does.
+# For each class it also shows how much faster the new normalizer is over all of its inputs.
+# Exits with 1 if anything differs.
+# Run it from anywhere with: python benchmarks/fuzz_normalizer.py [--seed=1] [--cases=2000]
+
+import os
+import random
+import sys
+import time
+
+benchDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(benchDir), "synthDrivers"))
+sys.path.insert(0, benchDir)
+from _ttnormalizer import normalize
+from legacy_normalizer import legacyNormalize
+
+triggerAlphabet = "0123456789,.:$ stndrhSTNDRH\tMcxkgl-"
+words = ["the", "at", "it", "cost", "Mc", "Donalds", "kg", "l", "km", "mph", "st", "nd", "rd", "th", "o clock", "a.m.", "x"]
+
+def number(rng, digits=None):
+	digits = digits or rng.randint(1, 7)
+	text = "".join(rng.choice("0123456789") for i in range(digits))
+	if rng.random() < 0.3:
+		text = "0"*rng.randint(1, 3)+text
+	return text
+
+def withCommas(rng):
+	text = number(rng, rng.randint(1, 3))
+	for group in range(rng.randint(0, 3)):
+		text += "," + number(rng, rng.choice((3, 3, 3, 2, 4)))
+	return text
+
+def decimal(rng):
+	return rng.choice((number(rng), withCommas(rng))) + rng.choice(("", ".", "." + number(rng, rng.randint(1, 5)), ".5.2"))
+
+def time_(rng):
+	text = "%s:%s" % (rng.choice(("0", "00", "6", "06", "10", "23")), rng.choice(("00", "03", "30", "0", "5")))
+	if rng.random() < 0.5:
+		text += ":" + rng.choice(("00", "01", "30", "0"))
+	return text
+
+def money(rng):
+	return "$" + rng.choice((number(rng), withCommas(rng), decimal(rng))) + rng.choice(("", "M", "K", " million", ".", ","))
+
+def ordinal(rng):
+	return number(rng, rng.randint(1, 3)) + " "*rng.choice((0, 0, 1, 2)) + rng.choice(("st", "nd", "rd", "th", "ST", "Th", "s", "t"))
+
+def metric(rng):
+	return number(rng, rng.randint(1, 3)) + " "*rng.randint(0, 3) + rng.choice(("kg", "l", "m", "km", "l 16", "g", "")) + " "*rng.randint(0, 3)
+
+def unicodeDigits(rng):
+	return rng.choice(("٣", "\xb2", "\xbd", "⅕", "１", "1")) + rng.choice(("", ",", ".", ":", " ", "st", "0"))+ rng.choice(("٤", "5", "\xb3", ""))
+
+def sentence(rng, parts):
+	pieces = []
+	for i in range(rng.randint(1, 5)):
+		pieces.append(rng.choice(parts)(rng) if rng.random() < 0.6 else rng.choice(words))
+	return rng.choice((" ", "  ", ", ", " ")).join(pieces) + rng.choice(("", " ", ".", "  ", ":"))
+
+def randomText(rng):
+	return "".join(rng.choice(triggerAlphabet) for i in range(rng.randint(0, 40)))
+
+def split(rng, text):
+	# cut text into strings at random places like NVDA and programs like excel hand them over
+	cuts = sorted(rng.sample(range(len(text)+1), min(len(text)+1, rng.randint(1, 3))))
+	return [text[start:end] for start, end in zip([0]+cuts, cuts+[len(text)])]
+
+grammar = (time_, money, ordinal, withCommas, decimal, metric)
+classes = {
+	"random": lambda rng: [randomText(rng)],
+	"times": lambda rng: [sentence(rng, (time_,))],
+	"money": lambda rng: [sentence(rng, (money,))],
+	"ordinals": lambda rng: [sentence(rng, (ordinal,))],
+	"numbers": lambda rng: [sentence(rng, (withCommas, decimal))],
+	"metric": lambda rng: [sentence(rng, (metric,))],
+	"unicode digits": lambda rng: [sentence(rng, (unicodeDigits, metric))],
+	"split strings": lambda rng: split(rng, sentence(rng, grammar)),
+	"split random": lambda rng: split(rng, randomText(rng)),
+}
+
+def run(func, strings):
+	# carries previousMetric from one string to the next the way speak does
+	previousMetric = False
+	result = []
+	for item in strings:
+		item, previousMetric = func(item, previousMetric)
+		result.append((item, previousMetric))
+	return result
+
+def differs(strings):
+	return run(normalize, strings) != run(legacyNormalize, strings)
+
+def minimize(strings):
+	# Delta debugging, first whole strings then chunks of characters from halves down to single ones, keeping any cut that still differs.
+	strings = list(strings)
+	changed = True
+	while changed:
+		changed = False
+		for position in range(len(strings)-1, -1, -1):
+			candidate = strings[:position]+strings[position+1:]
+			if candidate and differs(candidate):
+				strings = candidate
+				changed = True
+		for position in range(len(strings)):
+			size = max(1, len(strings[position])//2)
+			while size:
+				start = 0
+				while start < len(strings[position]):
+					text = strings[position]
+					candidate = strings[:position]+[text[:start]+text[start+size:]]+strings[position+1:]
+					if differs(candidate):
+						strings = candidate
+						changed = True
+					else:
+						start += size
+				size //= 2
+	return strings
+
+def timeRuns(func, cases):
+	start = time.perf_counter()
+	for strings in cases:
+		run(func, strings)
+	return time.perf_counter()-start
+
+def main():
+	seed = 1
+	count = 2000
+	for arg in sys.argv[1:]:
+		if arg.startswith("--seed="):
+			seed = int(arg.split("=", 1)[1])
+		elif arg.startswith("--cases="):
+			count = int(arg.split("=", 1)[1])
+	rng = random.Random(seed)
+	failures = []
+	seen = set() # the same difference usually turns up in several classes, only show it once
+	print("%-16s %8s %10s %14s %14s %8s" % ("class", "cases", "differ", "legacy", "normalize", "speedup"))
+	for name, generate in classes.items():
+		cases = [generate(rng) for i in range(count)]
+		mismatches = [strings for strings in cases if differs(strings)]
+		legacyTime = timeRuns(legacyNormalize, cases)
+		newTime = timeRuns(normalize, cases)
+		print("%-16s %8d %10d %12.1fms %12.1fms %7.1fx" % (name, count, len(mismatches), legacyTime*1000, newTime*1000, legacyTime/newTime))
+		for strings in mismatches:
+			smallest = tuple(minimize(strings))
+			if smallest not in seen:
+				seen.add(smallest)
+				failures.append((name, smallest))
+	for name, strings in failures:
+		print("%s: %r" % (name, list(strings)))
+		print("  normalize %r" % run(normalize, strings))
+		print("  legacy    %r" % run(legacyNormalize, strings))
+	return 1 if failures else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,258 @@
+#benchmarks/legacy_normalizer.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# The string handling loop from SynthDriver.speak as it was before the normalizer was split out into synthDrivers/_ttnormalizer.py.
+# It is kept verbatim (apart from the previousMetric state living on a small holder instead of the driver) so the benchmarks
+# can compare speed against it and check that the new normalizer produces exactly the same text.
+
+class _State(object):
+	previousMetric = False
+
+def legacyNormalize(item, previousMetric=False, characterMode=False):
+	state = _State()
+	state.previousMetric = previousMetric
+	item_list = []
+	itemIndex = 0
+	itemLen = len(item)
+	if state.previousMetric:
+		# the previous string ended with a number so put a space at the beginning of this one as not to run numbers together	
+		# We have to do it this way instead of just adding a space at the end of the previous string while processing it
+		# because programs like excel can send something like "28  " "l 16  " in two separate strings
+		# and our metric processing would turn it into "28" "l 16" blocking the metric processing, but if the next string
+		# starts with a number we have to prefix it with a space
+		# if we do it while processing the previous string we'll get "28 " "l 16 " which won't block the metric processing
+		state.previousMetric = False
+		if itemLen and not characterMode and item[0].isnumeric():
+			if not item_list: item_list = list(item)
+			metricString = " "
+			metricString += item[0]
+			item_list[0] = metricString
+	for elementIndex, element in enumerate(item):
+		# Block everything below 32.  The TT dll does some of this, but it can't block the control char 0x01, flush 0x18, etc and allowing these in the text would cause problems with the synth.
+		if ord(element) < 32:
+			if not item_list: item_list = list(item)
+			item_list[elementIndex] = " "
+		elif not characterMode:
+			#fix so that the synthesizer says time correctly and also make it report leading zeros for numbers.
+			# remove the comma character only when it is in a number so the synthesizer says numbers correctly
+			# this only seems to matter if you set nopauses=1 in ttusbd.ini in the windows directory
+			# fix issues the synth has pronouncing money
+			# stop the synth from saying metric stuff like liters, grams, etc
+			# fix date stuff like 1st, 2nd, 3rd, 4th, etc
+			# fix words that NVDA splits that it shouldn't like McDonalds
+			if elementIndex < itemIndex: # skip the indexes we already processed for point, comma, leading zeros, money, metric stuff, or date stuff the previous time through the loop
+				continue
+			itemIndex = 0
+			if (((element == 'n' or element == 'N' or element == 'r' or element == 'R') and elementIndex+1 in range(itemLen) and (item[elementIndex+1] == 'd' or item[elementIndex+1] == 'D')) or
+			((element == 's' or element == 'S') and elementIndex+1 in range(itemLen) and (item[elementIndex+1] == 't' or item[elementIndex+1] == 'T')) or
+			((element == 't' or element == 'T') and elementIndex+1 in range(itemLen) and (item[elementIndex+1] == 'h' or item[elementIndex+1] == 'H'))):
+				# prevent the synth from doing date stuff like 21st being twenty first instead of 21 st etc.
+				tempIndex = elementIndex-1
+				while tempIndex >= 0:
+					if not item[tempIndex] == ' ':
+						break
+					tempIndex-=1
+				if tempIndex>= 0 and item[tempIndex].isnumeric():
+					if not item_list: item_list = list(item)
+					tempString = item[tempIndex]
+					tempString += ","
+					item_list[tempIndex] = tempString
+					itemIndex = elementIndex+2 # skip the chars we just processed
+			elif element == '.': # make it pronounce decimals correctly
+				if elementIndex == 0 or (elementIndex > 0 and (item[elementIndex-1].isnumeric() or
+				item[elementIndex-1] == ' ')) and elementIndex+1 in range(itemLen) and item[elementIndex+1].isnumeric:
+					if not item_list: item_list = list(item)
+					item_list[elementIndex] = " point "
+					itemIndex = elementIndex+1
+					while itemIndex in range(itemLen) and item[itemIndex] == '0':
+						item_list[itemIndex] = "o "
+						itemIndex+=1
+			elif element == ',':
+				if elementIndex > 0 and item[elementIndex-1].isnumeric():
+					commaIndex = elementIndex
+					itemIndex = elementIndex
+					numDigits = 0
+					while itemIndex in range(itemLen):
+						if not item[itemIndex].isnumeric() and not item[itemIndex] == ',':
+							break
+						if item[itemIndex].isnumeric():
+							numDigits +=1
+						elif item[itemIndex] == ',':
+							if not item_list: item_list = list(item)
+							if numDigits == 3 or (numDigits == 0 and itemIndex+1 in range(itemLen) and item[itemIndex+1].isalpha()):
+							# the second half of this if is for metric processing
+								item_list[commaIndex] = ""
+							elif numDigits > 0:
+								item_list[commaIndex] = " "
+							numDigits = 0
+							commaIndex = itemIndex
+						itemIndex+=1
+					if numDigits:
+						if not item_list: item_list = list(item)
+						if numDigits == 3 or (numDigits == 0 and itemIndex+1 in range(itemLen) and item[itemIndex+1].isalpha()):
+						# the second half of this if is for metric processing
+							item_list[commaIndex] = ""
+						elif numDigits > 0:
+							item_list[commaIndex] = " "
+			elif element == ' ': # stop the synth from saying metric items like liter, gram, etc and fix words like McDonalds
+				# NVDA splitting words of mixed case is bad for things like McDonalds so prevent it
+				if elementIndex >= 2 and item[elementIndex-1] == 'c' and item[elementIndex-2] == 'M':
+					if not item_list: item_list = list(item)
+					item_list[elementIndex] = ""
+				elif (elementIndex > 1 and item[elementIndex-2].isnumeric() and elementIndex+1 in range(itemLen) and item[elementIndex+1].isalpha() and
+				(item[elementIndex-1] == ':' or item[elementIndex-1] == ',')):
+					if not item_list: item_list = list(item)
+					item_list[elementIndex-1] = ""
+					item_list[elementIndex] = ""
+				elif elementIndex > 0 and item[elementIndex-1].isnumeric():
+					itemIndex = elementIndex
+					while itemIndex in range(itemLen):
+						if not item[itemIndex] == ' ':
+							break
+						if not item_list: item_list = list(item)
+						item_list[itemIndex] = ""
+						itemIndex+=1
+					if not itemIndex in range(itemLen): # set previousMetric since we are at the end of this string so we can handle it at the beginning of the next string
+						state.previousMetric = True
+					if itemIndex in range(itemLen) and item[itemIndex].isnumeric(): # don't run numbers previously separated by spaces together
+						if not item_list: item_list = list(item)
+						item_list[itemIndex-1] = " "
+			elif element == '$':
+				pointNotFound = True
+				if elementIndex > 0 and not item[elementIndex-1] == ' ':
+					if not item_list: item_list = list(item)
+					item_list[elementIndex] = " $"
+				itemIndex = elementIndex+1
+				while itemIndex in range(itemLen):
+					if not item[itemIndex].isnumeric() and item[itemIndex] != '.' and item[itemIndex] != ',':
+						break
+					elif item[itemIndex] == ',' and itemIndex+1 in range(itemLen) and item[itemIndex+1].isnumeric:
+						if not item_list: item_list = list(item)
+						item_list[itemIndex] = ""
+					elif item[itemIndex] == '.':
+						pointNotFound = False
+						if itemIndex+3 in range(itemLen) and item[itemIndex+1].isnumeric() and item[itemIndex+2].isnumeric() and item[itemIndex+3].isnumeric():
+							tempIndex = itemIndex+1
+							isLeadingZero = True
+							moneyString = " and "
+							while tempIndex in range(itemLen) and item[tempIndex].isnumeric():
+								if not item_list: item_list = list(item)
+								item_list[tempIndex] = ""
+								if item[tempIndex] == '0' and isLeadingZero:
+									moneyString += "zero "
+								else:
+									isLeadingZero = False
+								if item[tempIndex] > '0':
+									moneyString += item[tempIndex]
+								tempIndex+=1
+							moneyString += " cents "
+							if not item_list: item_list = list(item)
+							item_list[tempIndex-1] = moneyString
+							itemIndex = tempIndex-1
+						elif itemIndex+2 in range(itemLen) and item[itemIndex+1] == '0' and (item[itemIndex+2] == '0' or not item[itemIndex+2].isnumeric()):
+							if not item_list: item_list = list(item)
+							item_list[itemIndex+1] = ""
+							item_list[itemIndex+2] = ""
+						elif itemIndex+2 in range(itemLen) and item[itemIndex+1].isnumeric() and item[itemIndex+1] > '0' and not item[itemIndex+2].isnumeric():
+							if not item_list: item_list = list(item)
+							moneyString = " and "
+							moneyString += item_list[itemIndex+1]
+							moneyString += "0 cents "
+							item_list[itemIndex+1] = moneyString
+						elif itemIndex+2 in range(itemLen) and item[itemIndex+1] == '0' and item[itemIndex+2] == '1':
+							if not item_list: item_list = list(item)
+							item_list[itemIndex+1] = "and 1 cent"
+							item_list[itemIndex+2] = ""
+						elif itemIndex+2 in range(itemLen) and item[itemIndex+1].isnumeric() and item[itemIndex+2].isnumeric():
+							if item[itemIndex+1] == '0':
+								moneyString = " and "
+								moneyString += item[itemIndex+2]
+								moneyString += " cents "
+							elif item[itemIndex+1] >= '1':
+								moneyString = " and "
+								moneyString += item[itemIndex+1]
+								moneyString += item[itemIndex+2]
+								moneyString += " cents "
+							if not item_list: item_list = list(item)
+							item_list[itemIndex+1] = moneyString
+							item_list[itemIndex+2] = ""
+					itemIndex+=1
+				if pointNotFound:
+					if itemIndex+1 in range(itemLen) and item[itemIndex] == ' ' and item[itemIndex+1].isalpha():
+						skipString = "bBmM"
+						if item[itemIndex+1] not in skipString:
+							if not item_list: item_list = list(item)
+							moneyString = ". "
+							item_list[itemIndex] = moneyString
+							itemIndex+=2
+						elif (item[itemIndex+1] == 'b' or item[itemIndex+1] == 'B') and itemIndex+2 in range(itemLen) and (item[itemIndex+2] == 'y' or item[itemIndex+2] == 'Y'):
+							if not item_list: item_list = list(item)
+							moneyString = ". "
+							item_list[itemIndex] = moneyString
+							itemIndex+=3
+					elif itemIndex in range(itemLen) and item[itemIndex].isalpha():
+						skipString = "bBmM"
+						if item[itemIndex] not in skipString:
+							if not item_list: item_list = list(item)
+							moneyString = "."
+							moneyString += item[itemIndex]
+							item_list[itemIndex] = moneyString
+							itemIndex+=1
+						elif (item[itemIndex] == 'b' or item[itemIndex] == 'B') and itemIndex+1 in range(itemLen) and (item[itemIndex+1] == 'y' or item[itemIndex+1] == 'Y'):
+							if not item_list: item_list = list(item)
+							moneyString = "."
+							moneyString += item[itemIndex]
+							item_list[itemIndex] = moneyString
+							itemIndex+=2
+			elif element == ':':
+				if elementIndex > 0 and item[elementIndex-1].isnumeric() and elementIndex+1 in range(itemLen) and item[elementIndex+1].isalpha(): # this is for metric processing
+					if not item_list: item_list = list(item)
+					item_list[elementIndex] = ""
+				else:
+					allowOClock = True
+					hasSeconds = False
+					if elementIndex >= 3 and item[elementIndex-3] == ':':
+						hasSeconds = True
+					if elementIndex >= 2 and item[elementIndex-1] == '0' and item[elementIndex-2] == '0':
+						if not hasSeconds:
+							if not item_list: item_list = list(item)
+							item_list[elementIndex	-2] = ""
+					if elementIndex == 0 or item[elementIndex-1] == '0':
+						allowOClock = False
+					if elementIndex >= 2 and item[elementIndex-2] == '1': #for 10 o clock
+						allowOClock = True
+				if element == ':' and elementIndex+2 in range(itemLen) and item[elementIndex+1] == '0':
+					if not item_list: item_list = list(item)
+					if allowOClock and not hasSeconds:
+						if item[elementIndex+2].isnumeric():
+							item_list[elementIndex+1] = "o "
+					else:
+						item_list[elementIndex+1] = "zero "
+					if item[elementIndex+2] == '0':
+						if not item_list: item_list = list(item)
+						if allowOClock and not hasSeconds:
+							item_list[elementIndex+2] = "clock "
+						else:
+							item_list[elementIndex+2] = "zero "
+			elif element == '0':
+				if elementIndex == 0 or (elementIndex > 0 and item[elementIndex-1] == ' ' and elementIndex+1 in range(itemLen) and not item[elementIndex+1] == ' '):
+					tempIndex = elementIndex
+					while tempIndex in range(itemLen):
+						if item[tempIndex] == ':':
+							tempIndex = 0
+							break
+						elif item[tempIndex] != '0':
+							break
+						tempIndex +=1
+					if tempIndex and tempIndex+1 in range(itemLen) and item[tempIndex+1] != ':': # the part after testing tempIndex prevents leading zeros on time
+						itemIndex = tempIndex
+						tempIndex -=1
+						if not item_list: item_list = list(item)
+						while tempIndex >= elementIndex:
+							item_list[tempIndex] = "zero "
+							tempIndex -=1
+	if item_list:
+		item = "".join(item_list)
+	return item, state.previousMetric
@@ -0,0 +1,200 @@
+#benchmarks/nvdastubs.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Just enough of NVDA, kernel32 and ttusbd.dll for synthDrivers/ttusb.py to be imported and driven outside of NVDA on any OS.
+# None of this is used by the driver itself, it only exists so the benchmarks can measure it.
+
+import builtins
+import ctypes
+import _ctypes
+import ctypes.wintypes
+import os
+import re
+import subprocess
+import sys
+import time
+import types
+
+benchDir = os.path.dirname(os.path.abspath(__file__))
+rootDir = os.path.dirname(benchDir)
+
+class Notification(object):
+	# keeps every notification with the time it was sent
+	def __init__(self):
+		self.calls = []
+		self.times = []
+	def notify(self, **kwargs):
+		self.times.append(time.perf_counter())
+		self.calls.append(kwargs)
+	def clear(self):
+		self.calls = []
+		self.times = []
+
+class ForegroundObject(object):
+	# processID can mean a call into another process, api.processIDCost is how long it spins for that and api.processIDCalls counts them
+	def __init__(self, processID=1):
+		self._processID = processID
+	@property
+	def processID(self):
+		api = sys.modules["api"]
+		api.processIDCalls += 1
+		if api.processIDCost:
+			end = time.perf_counter()+api.processIDCost
+			while time.perf_counter() < end:
+				pass
+		return self._processID
+
+class Setting(object):
+	def __init__(self, *args, **kwargs):
+		self.args = args
+
+class BaseSynthDriver(object):
+	RateSetting = Setting
+	PitchSetting = Setting
+	InflectionSetting = Setting
+	VolumeSetting = Setting
+	VariantSetting = Setting
+	@classmethod
+	def _percentToParam(cls, percent, min, max):
+		return float(percent)/100*(max-min)+min
+	@classmethod
+	def _paramToPercent(cls, current, min, max):
+		return round(float(current-min)/(max-min)*100)
+
+class SpeechCommand(object):
+	pass
+
+class IndexCommand(SpeechCommand):
+	def __init__(self, index):
+		self.index = index
+
+class PitchCommand(SpeechCommand):
+	def __init__(self, offset=0):
+		self.offset = offset
+
+class CharacterModeCommand(SpeechCommand):
+	def __init__(self, state):
+		self.state = state
+
+class Kernel32(object):
+	class Function(object):
+		def __init__(self, result):
+			self.result = result
+		def __call__(self, *args):
+			return self.result
+	def __init__(self):
+		self.GetPrivateProfileIntW = self.Function(0)
+		self.WritePrivateProfileStringW = self.Function(1)
+
+indexCommand = re.compile(rb"\x01(\d+)i")
+
+class FakeDll(object):
+	# Stands in for ttusbd.dll, it keeps every byte written along with when it was written.
+	# It acts like a TT that says everything the moment it gets a carriage return so the indexes in the text can be read back straight away,
+	# they are only looked for when read so writing a byte costs the same as it always has.
+	# byteCost is how long to spin for each byte to act like a USB driver that takes time to accept them.
+	# The functions are plain functions rather than methods so DllTransport can set argtypes on them like it does on the real ones.
+	def __init__(self, byteCost=0):
+		self.written = bytearray()
+		self.calls = 0
+		self.lastWriteTime = 0
+		self.byteCost = byteCost
+		self._handle = 0
+		self._scanned = 0
+		self._indexes = []
+		def USBTT_WriteByte(value):
+			if self.byteCost:
+				end = time.perf_counter()+self.byteCost
+				while time.perf_counter() < end:
+					pass
+			self.written.append(value)
+			self.calls += 1
+			self.lastWriteTime = time.perf_counter()
+			return 0
+		def USBTT_ReadByte():
+			end = self.written.rfind(b"\r")+1
+			if end > self._scanned:
+				self._indexes.extend(int(match.group(1)) for match in indexCommand.finditer(self.written, self._scanned, end))
+				self._scanned = end
+			if self._indexes:
+				return self._indexes.pop(0)
+			return -1
+		self.USBTT_WriteByte = USBTT_WriteByte
+		self.USBTT_WriteByteImmediate = USBTT_WriteByte
+		self.USBTT_ReadByte = USBTT_ReadByte
+
+def _module(name, **attributes):
+	module = types.ModuleType(name)
+	module.__dict__.update(attributes)
+	sys.modules[name] = module
+	return module
+
+def install():
+	if "synthDriverHandler" in sys.modules:
+		return
+	builtins._ = lambda text: text
+	ctypes.WinDLL = lambda name, **kwargs: Kernel32()
+	if not hasattr(_ctypes, "FreeLibrary"):
+		_ctypes.FreeLibrary = lambda handle: None
+	secureDesktop = _module("winAPI.secureDesktop", post_secureDesktopStateChange=types.SimpleNamespace(register=lambda handler: None))
+	_module("winAPI", secureDesktop=secureDesktop)
+	# foregroundCost is how long to spin in getForegroundObject, in NVDA it is a cross process call which is far from free
+	api = _module("api", foregroundObject=ForegroundObject(), foregroundCalls=0, foregroundCost=0, processIDCalls=0, processIDCost=0)
+	def getForegroundObject():
+		api.foregroundCalls += 1
+		if api.foregroundCost:
+			end = time.perf_counter()+api.foregroundCost
+			while time.perf_counter() < end:
+				pass
+		return api.foregroundObject
+	api.getForegroundObject = getForegroundObject
+	# nothing is kept in the config directory so the driver finds no pronunciations, benchmarks that want some set them on ttusb.textCache
+	_module("globalVars", appArgs=types.SimpleNamespace(configPath=os.path.join(benchDir, "no-config")))
+	_module("synthDriverHandler", SynthDriver=BaseSynthDriver, synthDoneSpeaking=Notification(), synthIndexReached=Notification(),
+		VoiceInfo=lambda id, name: (id, name))
+	commands = _module("speech.commands", IndexCommand=IndexCommand, PitchCommand=PitchCommand, CharacterModeCommand=CharacterModeCommand)
+	_module("speech", commands=commands)
+	_module("logHandler", log=types.SimpleNamespace(warning=print, error=print, debug=lambda *args: None, info=lambda *args: None))
+	driverSetting = _module("autoSettingsUtils.driverSetting", DriverSetting=Setting)
+	utils = _module("autoSettingsUtils.utils", StringParameterInfo=Setting)
+	_module("autoSettingsUtils", driverSetting=driverSetting, utils=utils)
+
+def loadDriver(rev=None):
+	# Imports synthDrivers/ttusb.py from the working tree, or from a git revision to compare against an older driver.
+	install()
+	if rootDir not in sys.path:
+		sys.path.insert(0, rootDir)
+	if rev is None:
+		import synthDrivers.ttusb
+		return synthDrivers.ttusb
+	source = subprocess.check_output(["git", "show", "%s:synthDrivers/ttusb.py" % rev], cwd=rootDir)
+	module = types.ModuleType("synthDrivers.ttusb_%s" % rev)
+	module.__package__ = "synthDrivers"
+	module.__file__ = os.path.join(rootDir, "synthDrivers", "ttusb.py")
+	exec(compile(source, "ttusb.py@%s" % rev, "exec"), module.__dict__)
+	return module
+
+def baselineRev():
+	return subprocess.check_output(["git", "rev-list", "--max-parents=0", "HEAD"], cwd=rootDir).decode().split()[0]
+
+def createSynth(ttusb, dll=None, loopback=False):
+	# does what load_dll does when it finds the real dll
+	# loopback puts the driver on LoopbackTransport from synthDrivers/_tttransport.py instead of going through the dll functions, for drivers that have transports
+	ttusb.USBTT = dll or FakeDll()
+	if hasattr(ttusb, "nvdaIndexes"):
+		ttusb.nvdaIndexes = [0] * 100
+	if hasattr(ttusb, "DllTransport"):
+		if loopback:
+			from synthDrivers._tttransport import LoopbackTransport
+			ttusb.transport = LoopbackTransport()
+		else:
+			ttusb.transport = ttusb.DllTransport(ttusb.USBTT)
+	return ttusb.SynthDriver()
+
+def waitForWrites(synth):
+	# drivers with a writer thread return from speak before the bytes are written
+	writerThread = getattr(synth, "writerThread", None)
+	if writerThread:
+		writerThread.idle.wait()
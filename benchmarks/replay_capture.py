@@ -0,0 +1,417 @@
+#benchmarks/replay_capture.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Looks at a capture made with SynthDriver.startCapture, see synthDrivers/_ttcapture.py, and replays it.
+# Without --drive it shows what the capture says about the session: how much was written and read, how often the index thread polled,
+# and how long each index took from being written until the TT gave it back.
+# With --drive it works out from the bytes what NVDA must have asked for, an utterance with its text, indexes and pitch changes for every index and carriage return that ends one,
+# a cancel for every flush and pause and resume, and has the driver in the working tree, or the one from --before, do the same things at the same times.
+# By default it does them against CapturedTT, which gives the indexes back when the user's TT did so slow index tracking from the field shows up in the replay,
+# --device=emulator uses the emulated TT in ttemulator.py instead.  Both take as long over each byte as the user's dll did going by the capture, or --byte-cost microseconds,
+# since that is what makes a cancel wait behind a write.  The bytes going to the device are captured too so both can be compared, and how long each cancel took to reach it is shown.
+# speed makes the emulated TT that much faster and the replay that much shorter, times from the replay are multiplied back up by it.
+# The index thread polls on its own clock though, so reads per second from a sped up replay are low.
+# What can't be worked out from the bytes: which strings were in character mode and how the text was split into strings.  The index the driver adds at the end
+# of every utterance is taken to be an index straight before a carriage return, a carriage return straight after text is speak starting the TT on a long sequence,
+# so when the TT had no index free for the end of an utterance the next one gets joined onto it.
+# Indexes from CapturedTT are matched up by how many index commands came before them, a driver that sends a different number of them gets them back at the wrong times.
+# --record-demo makes a capture to try it on by running some navigation, a say all and a long paragraph through the driver in the working tree with the capture on.
+# Run it with: python benchmarks/replay_capture.py capture.ttcap [--drive] [--device=capture|emulator] [--byte-cost=us] [--before=rev] [--speed=10]
+#          or: python benchmarks/replay_capture.py --record-demo=demo.ttcap
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+import nvdastubs
+from nvdastubs import IndexCommand, PitchCommand
+from bench_latency import percentile, waitFor
+from ttemulator import TripleTalkEmulator
+
+sys.path.insert(0, nvdastubs.rootDir)
+from synthDrivers._ttcapture import CaptureWriter, readCapture, varint, WRITE, IMMEDIATE, READ
+
+def summarize(records, scale=1.0):
+	# scale multiplies every time, for a replay that ran faster than the original.
+	# The bytes are gone through one at a time since a command can be split over two writes, and a replay records each byte on its own.
+	bytesWritten = immediateBytes = reads = emptyReads = utterances = flushes = 0
+	sent = {} # TT index: times it was written and not read back yet
+	roundTrips = []
+	command = None
+	first = last = None
+	for kind, at, payload in records:
+		at *= scale
+		if first is None:
+			first = at
+		last = at
+		if kind == READ:
+			reads += 1
+			if payload == -1:
+				emptyReads += 1
+			elif sent.get(payload):
+				roundTrips.append(at-sent[payload].pop(0))
+			continue
+		data = payload if kind == WRITE else bytes((payload,))
+		bytesWritten += len(data)
+		for byte in data:
+			if byte == 0x1e:
+				immediateBytes += 1
+			elif byte == 0x18:
+				flushes += 1
+				sent.clear() # nothing written before a flush is coming back
+				command = None
+			elif byte == 0x01:
+				command = ""
+			elif command is not None and 0x30 <= byte <= 0x39:
+				command += chr(byte)
+			else:
+				if command and byte == ord("i"):
+					sent.setdefault(int(command), []).append(at)
+				command = None
+				if byte == 0x0d:
+					utterances += 1
+	seconds = (last-first) if first is not None else 0
+	return {
+		"seconds": seconds,
+		"bytes written": bytesWritten,
+		"immediate bytes": immediateBytes,
+		"utterances": utterances,
+		"flushes": flushes,
+		"reads": reads,
+		"empty reads": emptyReads,
+		"reads per second": reads/seconds if seconds else 0.0,
+		"index round trip p50 ms": percentile(roundTrips, 0.5)*1000 if roundTrips else None,
+		"index round trip p95 ms": percentile(roundTrips, 0.95)*1000 if roundTrips else None,
+		"index round trip max ms": max(roundTrips)*1000 if roundTrips else None,
+	}
+
+def reconstruct(records):
+	# Returns (seconds, action, argument) for what NVDA asked the driver to do: speak with a sequence, cancel, pause, resume, and rate and pitch for the settings.
+	actions = []
+	sequence = []
+	text = bytearray()
+	command = None
+	basePitch = None
+	started = None
+	nextIndex = 0
+	def endText():
+		if text:
+			sequence.append(text.decode("ascii", "replace"))
+			del text[:]
+	for kind, at, payload in records:
+		if kind == READ:
+			continue
+		data = payload if kind == WRITE else bytes((payload,))
+		for byte in data:
+			if byte == 0x1e:
+				continue
+			if command is not None:
+				if 0x30 <= byte <= 0x39:
+					command += chr(byte)
+					continue
+				if command:
+					value = int(command)
+					if byte == ord("i"):
+						sequence.append(IndexCommand(nextIndex))
+						nextIndex += 1
+					elif byte == ord("s"):
+						actions.append((at, "rate", value*10))
+					elif byte == ord("p"):
+						if any(isinstance(item, str) for item in sequence) or basePitch is None and sequence:
+							sequence.append(PitchCommand(value-(basePitch or 50)))
+						else:
+							basePitch = value
+							actions.append((at, "pitch", value))
+				command = None
+				if byte != 0x0d:
+					continue
+			if byte == 0x18:
+				endText()
+				if sequence:
+					actions.append((started, "speak", sequence)) # it was cut off but NVDA had asked for all of it
+				sequence = []
+				started = None
+				actions.append((at, "cancel", None))
+			elif byte == 0x10:
+				actions.append((at, "pause", None))
+			elif byte == 0x12:
+				actions.append((at, "resume", None))
+			elif byte == 0x01:
+				endText()
+				command = ""
+				if started is None:
+					started = at
+			elif byte == 0x0d:
+				if text or not sequence or not isinstance(sequence[-1], IndexCommand):
+					# speak puts a carriage return straight after the text every streamBytes so the TT starts on a long sequence, the sequence carries on after it
+					endText()
+					continue
+				sequence.pop() # the index the driver puts at the end of every utterance
+				if sequence:
+					actions.append((started if started is not None else at, "speak", sequence))
+				sequence = []
+				started = None
+			else:
+				text.append(byte)
+				if started is None:
+					started = at
+	return actions
+
+def estimateByteCost(records):
+	# How long the user's dll took over each byte, from chunks the writer thread wrote one straight after the other.
+	# A capture only has when each write finished so the gap before a chunk is the time it took plus anything else going on, the lower quartile leaves most of that out.
+	costs = []
+	previous = None
+	for kind, at, payload in records:
+		if kind == WRITE and len(payload) >= 32 and previous is not None:
+			costs.append((at-previous)/len(payload))
+		previous = at if kind == WRITE and len(payload) >= 32 else None
+	return percentile(costs, 0.25) if costs else 0.0
+
+def parseByte(command, byte):
+	# Returns the command being read after byte and what byte finished, "flush", a TT index or None.
+	if byte == 0x18:
+		return None, "flush"
+	if byte == 0x01:
+		return "", None
+	if command is not None:
+		if 0x30 <= byte <= 0x39:
+			return command+chr(byte), None
+		if command and byte == ord("i"):
+			return None, int(command)
+	return None, None
+
+class CapturedTT(object):
+	# Stands in for the user's TT, the indexes come back when they did in the capture instead of when the emulator works out they would.
+	# The index commands in the capture are counted in the order they were written and each index read is matched to the one it was for,
+	# the replay is handed that read at the same time as the TT index the replaying driver gave its own index command with the same count,
+	# so a driver that numbers TT indexes differently still gets back its own.  A flush throws away everything written before it like on a TT.
+	# It has the same three functions as ttusbd.dll and what drive needs from TripleTalkEmulator.
+	def __init__(self, records, speed=1.0, byteCost=0):
+		self.speed = speed
+		self.byteCost = byteCost
+		self.lock = threading.Lock()
+		self.flushes = []
+		self.reads = 0
+		self.emptyReads = 0
+		self._handle = 0
+		self._reads = deque() # (capture time, count of the index command) for every index the user's TT gave back
+		sent = {} # TT index: counts of the index commands with it that are out
+		count = 0
+		command = None
+		for kind, at, payload in records:
+			if kind == READ:
+				if sent.get(payload):
+					self._reads.append((at, sent[payload].pop(0)))
+				continue
+			for byte in payload if kind == WRITE else bytes((payload,)):
+				command, finished = parseByte(command, byte)
+				if finished == "flush":
+					sent.clear()
+				elif finished is not None:
+					sent.setdefault(finished, []).append(count)
+					count += 1
+		self.last = records[-1][1] if records else 0
+		self.origin = None # the time on the replay's clock that goes with capture time 0, set by start
+		self._command = None
+		self._written = [] # the TT index the replay used for each of its index commands so far
+		self._flushedBefore = 0 # index commands counted below this have been flushed
+		self._ready = deque()
+		def USBTT_WriteByte(value):
+			self.write(value)
+			return 0
+		def USBTT_ReadByte():
+			return self.read()
+		self.USBTT_WriteByte = USBTT_WriteByte
+		self.USBTT_WriteByteImmediate = USBTT_WriteByte
+		self.USBTT_ReadByte = USBTT_ReadByte
+
+	def start(self, origin):
+		self.origin = origin
+
+	def write(self, value):
+		if self.byteCost:
+			end = time.perf_counter()+self.byteCost
+			while time.perf_counter() < end:
+				pass
+		with self.lock:
+			self._command, finished = parseByte(self._command, value)
+			if finished == "flush":
+				self.flushes.append(time.perf_counter())
+				self._flushedBefore = len(self._written)
+				self._ready.clear()
+			elif finished is not None:
+				self._written.append(finished)
+
+	def read(self):
+		with self.lock:
+			self.reads += 1
+			if self.origin is not None:
+				now = (time.perf_counter()-self.origin)*self.speed
+				while self._reads and self._reads[0][0] <= now:
+					self._ready.append(self._reads.popleft()[1])
+			while self._ready and self._ready[0] < self._flushedBefore:
+				self._ready.popleft()
+			# the replay can be behind the capture, an index it hasn't written yet waits for it
+			if self._ready and self._ready[0] < len(self._written):
+				return self._written[self._ready.popleft()]
+			self.emptyReads += 1
+			return -1
+
+	def isSpeaking(self):
+		return self.origin is None or (time.perf_counter()-self.origin)*self.speed < self.last
+
+class RecordingDll(object):
+	# Goes in front of the device and captures every call the driver makes to it in the same format as a capture from NVDA,
+	# so drivers from before captures existed can be replayed too.
+	def __init__(self, dll, writer):
+		self._handle = 0
+		def USBTT_WriteByte(value):
+			result = dll.USBTT_WriteByte(value)
+			if value == 0x1e:
+				writer.record(IMMEDIATE, bytes((value,)))
+			else:
+				writer.record(WRITE, varint(1)+bytes((value,)))
+			return result
+		def USBTT_WriteByteImmediate(value):
+			result = dll.USBTT_WriteByteImmediate(value)
+			writer.record(IMMEDIATE, bytes((value,)))
+			return result
+		def USBTT_ReadByte():
+			value = dll.USBTT_ReadByte()
+			writer.record(READ, bytes(((value+1) & 0xff,)))
+			return value
+		self.USBTT_WriteByte = USBTT_WriteByte
+		self.USBTT_WriteByteImmediate = USBTT_WriteByteImmediate
+		self.USBTT_ReadByte = USBTT_ReadByte
+
+def drive(ttusb, actions, device, speed, path):
+	writer = CaptureWriter(path)
+	synth = nvdastubs.createSynth(ttusb, RecordingDll(device, writer))
+	cancels = []
+	start = time.perf_counter()
+	first = actions[0][0] if actions else 0
+	if isinstance(device, CapturedTT):
+		device.start(start-first/speed)
+	for at, action, argument in actions:
+		delay = start+(at-first)/speed-time.perf_counter()
+		if delay > 0:
+			time.sleep(delay)
+		if action == "speak":
+			synth.speak(argument)
+		elif action == "cancel":
+			flushes = len(device.flushes)
+			called = time.perf_counter()
+			synth.cancel()
+			waitFor(lambda: len(device.flushes) > flushes, 1)
+			if len(device.flushes) > flushes:
+				cancels.append(device.flushes[-1]-called) # the driver's own work, not sped up with the TT
+		elif action == "pause":
+			synth.pause(True)
+		elif action == "resume":
+			synth.pause(False)
+		elif action == "rate":
+			synth._set_rate(argument) # the stub SynthDriver has no properties
+		elif action == "pitch":
+			synth.tt_pitch = argument
+	waitFor(lambda: not device.isSpeaking(), 30)
+	time.sleep(0.05)
+	synth.terminate()
+	writer.close()
+	return cancels
+
+def recordDemo(path):
+	# the TT speaks at its real speed so the capture is like one from a user and can be replayed faster with --speed
+	ttusb = nvdastubs.loadDriver()
+	emulator = TripleTalkEmulator()
+	synth = nvdastubs.createSynth(ttusb, emulator)
+	synth.startCapture(path)
+	for step in range(40):
+		synth.cancel()
+		synth.speak(["Item %d of 40" % (step+1), IndexCommand(step), "button", PitchCommand(30), "H", PitchCommand(0), "ome", IndexCommand(1000+step)])
+		time.sleep(0.02)
+	for line in range(30):
+		synth.speak([IndexCommand(2000+line), "Line %d of the report, it cost $12.%02d at 10:30 on the 21st. " % (line, line)])
+	# long enough that speak starts the TT on it part way through
+	synth.speak([item for sentence in range(120) for item in (IndexCommand(3000+sentence), "Sentence %d of a long paragraph read in one go. " % sentence)])
+	time.sleep(3)
+	synth.cancel()
+	waitFor(lambda: not emulator.isSpeaking(), 10)
+	synth.stopCapture()
+	synth.terminate()
+
+def printSummaries(names, summaries):
+	print("%-26s" % "" + "".join("%16s" % name for name in names))
+	for key in summaries[0]:
+		line = "%-26s" % key
+		for summary in summaries:
+			value = summary[key]
+			line += "%16s" % ("-" if value is None else "%.1f" % value if isinstance(value, float) else "%d" % value)
+		print(line)
+
+def main():
+	path = None
+	before = None
+	speed = 10.0
+	driveIt = False
+	deviceName = "capture"
+	byteCost = None
+	for arg in sys.argv[1:]:
+		if arg.startswith("--record-demo="):
+			nvdastubs.install()
+			recordDemo(arg.split("=", 1)[1])
+			print("capture written to %s" % arg.split("=", 1)[1])
+			return 0
+		elif arg.startswith("--before="):
+			before = arg.split("=", 1)[1]
+		elif arg.startswith("--speed="):
+			speed = float(arg.split("=", 1)[1])
+		elif arg == "--drive":
+			driveIt = True
+		elif arg.startswith("--device="):
+			deviceName = arg.split("=", 1)[1]
+		elif arg.startswith("--byte-cost="):
+			byteCost = float(arg.split("=", 1)[1])/1000000
+		else:
+			path = arg
+	if not path or deviceName not in ("capture", "emulator"):
+		print("usage: python benchmarks/replay_capture.py capture.ttcap [--drive] [--device=capture|emulator] [--byte-cost=us] [--before=rev] [--speed=10]")
+		return 2
+	records = list(readCapture(path))
+	original = summarize(records)
+	if not driveIt:
+		printSummaries(["capture"], [original])
+		return 0
+	nvdastubs.install()
+	ttusb = nvdastubs.loadDriver(before)
+	if hasattr(ttusb, "rateCharsPerSecond"):
+		ttusb.rateCharsPerSecond = tuple(chars*speed for chars in ttusb.rateCharsPerSecond)
+	actions = reconstruct(records)
+	if byteCost is None:
+		byteCost = estimateByteCost(records)
+	print("%d utterances, %d cancels reconstructed, replaying against the %s at %.1fus a byte" % (sum(1 for action in actions if action[1] == "speak"),
+		sum(1 for action in actions if action[1] == "cancel"), "captured TT" if deviceName == "capture" else "emulator", byteCost*1000000))
+	handle, replayPath = tempfile.mkstemp(suffix=".ttcap")
+	os.close(handle)
+	try:
+		if deviceName == "capture":
+			device = CapturedTT(records, speed, byteCost)
+		else:
+			device = TripleTalkEmulator(speed, byteCost=byteCost)
+		cancels = drive(ttusb, actions, device, speed, replayPath)
+		replayed = summarize(list(readCapture(replayPath)), speed)
+	finally:
+		os.remove(replayPath)
+	printSummaries(["capture", "replay"], [original, replayed])
+	if cancels:
+		print("%-26s%16s%16.1f" % ("cancel to flush p50 ms", "", percentile(cancels, 0.5)*1000))
+		print("%-26s%16s%16.1f" % ("cancel to flush max ms", "", max(cancels)*1000))
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,220 @@
+#benchmarks/suite.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Runs SynthDriver.speak, cancel and the index thread over a few kinds of real speech with the NVDA stand ins in nvdastubs.py and FakeDll for the TT,
+# and reports throughput, latency and memory numbers as JSON so runs can be kept and compared to catch a change that makes things worse.
+# The corpora:
+#   problem_speech  every line of problem_speech.txt, one utterance each like say all
+#   spreadsheet     rows of numbers, money, times and dates with each cell its own string like NVDA reading a row
+#   source          the lines of the first version of synthDrivers/ttusb.py so the text doesn't change when the driver does
+#   prose           sentences of a story with numbers in it, an index before each
+#   typing          typing echo a character at a time with NVDA cancelling before each one and capitals raising the pitch
+# For each one:
+#   throughput      characters a second from the first call to speak until everything has been written and every index has come back, NVDA handing over utterances back to back
+#   speak           how long each call to speak took in that run
+#   write latency   from calling speak until the last byte of it was written, with cancel before each utterance like NVDA moving around
+#   done latency    from the last byte being written until synthDoneSpeaking, FakeDll says everything the moment it gets it so this is the index thread
+#   alloc           how much memory speak needed on top of what it already had, from tracemalloc
+#   bytes written   everything that went to the TT in the throughput run, it only changes when the bytes the driver sends change
+#   loopback        throughput again with the driver on LoopbackTransport instead of the dll functions, null for drivers from before transports
+# Run it with: python benchmarks/suite.py [--before=rev] [--corpora=prose,typing] [--limit=400] [--json=results.json] [--compare=earlier.json]
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import nvdastubs
+from nvdastubs import CharacterModeCommand, IndexCommand, PitchCommand
+from bench_latency import percentile, waitFor
+
+story = ("It was the best of times, it was the worst of times. On the 21st of March 1,024 people paid $12.50 each at 10:30 to see it. "
+	"The McDonalds down the road sold 3.5 kg of fries and 2 l of cola. Nobody knew why the 00:15 train left at 0:20. "
+	"She said “it’s fine” — and walked 2.5 km home, café au lait in hand. ").split(". ")
+
+def problemSpeech():
+	with open(os.path.join(nvdastubs.rootDir, "problem_speech.txt"), encoding="utf-8") as f:
+		lines = [line for line in f.read().splitlines() if line.strip()]
+	return [[IndexCommand(number), line] for number, line in enumerate(lines)]
+
+def spreadsheet():
+	rows = []
+	for row in range(1, 400):
+		rows.append(["Row %d" % row, "%d,%03d.%02d" % (row, row*7 % 1000, row % 100), "$%d.%02d" % (row*3, row % 100),
+			"%d:%02d" % (row % 12, row % 60), "%dth" % (row % 28+4), "%d kg" % (row % 50), IndexCommand(row)])
+	return rows
+
+def source():
+	text = subprocess.check_output(["git", "show", "%s:synthDrivers/ttusb.py" % nvdastubs.baselineRev()], cwd=nvdastubs.rootDir).decode("utf-8")
+	lines = [line.strip() for line in text.splitlines() if line.strip()]
+	return [[IndexCommand(number), line] for number, line in enumerate(lines)]
+
+def prose():
+	sequences = []
+	for number in range(400):
+		sentence = story[number % len(story)]
+		sequences.append([IndexCommand(number*2), sentence.replace("21st", "%dst" % (number % 30+1)), IndexCommand(number*2+1), "."])
+	return sequences
+
+def typing():
+	sequences = []
+	for number, character in enumerate("The Quick brown fox, café “quoted” 1234—done. " * 10):
+		sequence = [PitchCommand(30)] if character.isupper() else []
+		sequences.append(sequence+[CharacterModeCommand(True), character, CharacterModeCommand(False), IndexCommand(number)])
+	return sequences
+
+corpora = {"problem_speech": problemSpeech, "spreadsheet": spreadsheet, "source": source, "prose": prose, "typing": typing}
+interrupted = {"typing"} # NVDA cancels before each of these
+
+def textLength(sequence):
+	return sum(len(item) for item in sequence if isinstance(item, str))
+
+def throughput(ttusb, sequences, cancel, loopback=False):
+	dll = nvdastubs.FakeDll()
+	synth = nvdastubs.createSynth(ttusb, dll, loopback)
+	device = ttusb.transport if loopback else None
+	def written():
+		return device.bytesWritten if device else len(dll.written)
+	nvdastubs.waitForWrites(synth)
+	start = written()
+	times = []
+	began = time.perf_counter()
+	for sequence in sequences:
+		if cancel:
+			synth.cancel()
+		speakStart = time.perf_counter()
+		synth.speak(sequence)
+		times.append(time.perf_counter()-speakStart)
+	nvdastubs.waitForWrites(synth)
+	if hasattr(ttusb, "indexRing"):
+		waitFor(lambda: not ttusb.indexRing.outstanding, 5)
+	elapsed = time.perf_counter()-began
+	synth.terminate()
+	return {
+		"throughput chars/s": sum(textLength(sequence) for sequence in sequences)/elapsed,
+		"speak p50 us": percentile(times, 0.5)*1000000,
+		"speak p95 us": percentile(times, 0.95)*1000000,
+		"speak p99 us": percentile(times, 0.99)*1000000,
+		"bytes written": written()-start,
+	}
+
+def latency(ttusb, sequences):
+	doneSpeaking = sys.modules["synthDriverHandler"].synthDoneSpeaking
+	dll = nvdastubs.FakeDll()
+	synth = nvdastubs.createSynth(ttusb, dll)
+	writes = []
+	dones = []
+	for sequence in sequences[:200]:
+		synth.cancel()
+		nvdastubs.waitForWrites(synth)
+		doneSpeaking.clear()
+		start = time.perf_counter()
+		synth.speak(sequence)
+		nvdastubs.waitForWrites(synth)
+		writes.append(dll.lastWriteTime-start)
+		waitFor(lambda: doneSpeaking.calls, 0.2)
+		if doneSpeaking.calls:
+			dones.append(doneSpeaking.times[0]-dll.lastWriteTime)
+	synth.terminate()
+	result = {
+		"write latency p50 us": percentile(writes, 0.5)*1000000,
+		"write latency p95 us": percentile(writes, 0.95)*1000000,
+	}
+	# older drivers can miss the end of an utterance, that shows up as null and a count of the ones that did come
+	result["done latency p50 ms"] = percentile(dones, 0.5)*1000 if dones else None
+	result["done latency p95 ms"] = percentile(dones, 0.95)*1000 if dones else None
+	result["done notifications"] = len(dones)
+	return result
+
+def allocation(ttusb, sequences):
+	synth = nvdastubs.createSynth(ttusb)
+	peaks = []
+	tracemalloc.start()
+	for sequence in sequences[:50]:
+		synth.cancel()
+		nvdastubs.waitForWrites(synth)
+		tracemalloc.reset_peak()
+		current = tracemalloc.get_traced_memory()[0]
+		synth.speak(sequence)
+		nvdastubs.waitForWrites(synth)
+		peaks.append(tracemalloc.get_traced_memory()[1]-current)
+	tracemalloc.stop()
+	synth.terminate()
+	return {"alloc p50 bytes": percentile(peaks, 0.5), "alloc max bytes": max(peaks)}
+
+def run(ttusb, names, limit):
+	results = {}
+	for name in names:
+		sequences = corpora[name]()[:limit]
+		result = {"utterances": len(sequences), "chars": sum(textLength(sequence) for sequence in sequences)}
+		result.update(throughput(ttusb, sequences, name in interrupted))
+		if hasattr(ttusb, "DllTransport"):
+			# the same run on LoopbackTransport, the difference from throughput is what going through the dll functions a byte at a time costs
+			result["loopback chars/s"] = throughput(ttusb, sequences, name in interrupted, True)["throughput chars/s"]
+		else:
+			result["loopback chars/s"] = None
+		result.update(latency(ttusb, sequences))
+		result.update(allocation(ttusb, sequences))
+		results[name] = result
+	return results
+
+def printResults(results, earlier):
+	for name, result in results.items():
+		print(name)
+		for metric, value in result.items():
+			line = "  %-22s" % metric
+			line += "%14s" % ("-" if value is None else "%.1f" % value if isinstance(value, float) else "%d" % value)
+			before = earlier.get(name, {}).get(metric) if earlier else None
+			if before and value is not None:
+				line += "  was %14.1f  %+6.1f%%" % (before, (value-before)/before*100)
+			print(line)
+
+def main():
+	before = None
+	names = list(corpora)
+	limit = 400
+	jsonPath = None
+	comparePath = None
+	for arg in sys.argv[1:]:
+		if arg.startswith("--before="):
+			before = arg.split("=", 1)[1]
+		elif arg.startswith("--corpora="):
+			names = arg.split("=", 1)[1].split(",")
+		elif arg.startswith("--limit="):
+			limit = int(arg.split("=", 1)[1])
+		elif arg.startswith("--json="):
+			jsonPath = arg.split("=", 1)[1]
+		elif arg.startswith("--compare="):
+			comparePath = arg.split("=", 1)[1]
+	for name in names:
+		if name not in corpora:
+			print("unknown corpus %s, the corpora are %s" % (name, ", ".join(corpora)))
+			return 2
+	nvdastubs.install()
+	ttusb = nvdastubs.loadDriver(before)
+	if hasattr(ttusb, "rateCharsPerSecond"):
+		# FakeDll says everything the moment it gets it, so the index thread looks for indexes straight away and polls quickly
+		# otherwise throughput would only be how often it polls once speak is waiting for indexes to come back
+		ttusb.rateCharsPerSecond = tuple(chars*1000 for chars in ttusb.rateCharsPerSecond)
+		ttusb.fastPoll = 0.0005
+	revision = before or subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=nvdastubs.rootDir).decode().strip()+" working tree"
+	report = {"driver": revision, "python": platform.python_version(), "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"limit": limit, "results": run(ttusb, names, limit)}
+	earlier = None
+	if comparePath:
+		with open(comparePath, encoding="utf-8") as f:
+			earlier = json.load(f)
+		print("compared with %s from %s" % (earlier["driver"], earlier["time"]))
+	printResults(report["results"], earlier["results"] if earlier else None)
+	if jsonPath:
+		with open(jsonPath, "w", encoding="utf-8") as f:
+			json.dump(report, f, indent=1)
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,182 @@
+#benchmarks/ttemulator.py
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# A software TripleTalk for measuring index, done speaking and cancel latency without the hardware.
+# It has the same three functions as ttusbd.dll so it can be used wherever the driver expects USBTT, it parses the bytes the driver sends
+# (0x18 flush, 0x1e followed by ctrl-A commands like \x014s or \x0112i, 0x10 and 0x12 pause and resume, and the carriage return that starts speech)
+# and works out when each index would be reached from how much text comes before it and the rate and voice in effect at the time.
+# USBTT_ReadByte hands the indexes back once that time has come.
+# The speaking speeds are rough numbers for the TT voices, speed multiplies them so a benchmark doesn't have to wait as long as a real TT would take.
+# byteCost is how long each byte takes to get to the TT, the USB driver doesn't take bytes as fast as python can hand them over.
+
+import threading
+import time
+from collections import deque
+
+# characters per second at rate 0, each step of rate adds rateStep
+baseCharsPerSecond = 10.0
+rateStep = 2.2
+# how the voices compare to Perfect Paul
+variantSpeeds = {0: 1.0, 1: 0.9, 2: 0.95, 3: 1.05, 4: 1.1, 5: 1.0, 6: 1.05, 7: 0.9}
+
+def charsPerSecond(rate, variant):
+	return (baseCharsPerSecond+rateStep*rate)*variantSpeeds.get(variant, 1.0)
+
+class TripleTalkEmulator(object):
+	def __init__(self, speed=1.0, clock=time.perf_counter, byteCost=0):
+		self.speed = speed
+		self.byteCost = byteCost
+		self.clock = clock
+		self.lock = threading.Lock()
+		self.rate = 5
+		self.variant = 0
+		self.pitch = 50
+		self.volume = 5
+		self.inflection = 5
+		self._command = None
+		self._buffer = [] # text and commands waiting for a carriage return
+		self._text = []
+		self._scheduled = deque() # (time, index) for every index not reached yet
+		self._ready = deque() # indexes that have been reached but not read
+		self.busyUntil = 0 # when the TT will have finished everything it has been told to say
+		self.pausedAt = None
+		# what benchmarks look at
+		self.reached = [] # (index, time) in the order the TT reached them
+		self.flushes = [] # the time of every flush
+		self.utteranceEnds = [] # when each utterance finishes speaking, an utterance that gets flushed is cut short
+		self.carriageReturns = [] # when each carriage return came in and the TT could start on what came before it
+		self.firstWrite = 0 # when the first byte came in, set it back to 0 to time the next one
+		self.bytesWritten = 0
+		self.immediateBytes = 0
+		self.reads = 0
+		self.emptyReads = 0
+		# plain functions rather than methods so DllTransport can treat them like the functions in the real dll
+		def USBTT_WriteByte(value):
+			self.write(value)
+			return 0
+		def USBTT_WriteByteImmediate(value):
+			self.write(value, True)
+			return 0
+		def USBTT_ReadByte():
+			return self.read()
+		self.USBTT_WriteByte = USBTT_WriteByte
+		self.USBTT_WriteByteImmediate = USBTT_WriteByteImmediate
+		self.USBTT_ReadByte = USBTT_ReadByte
+		self._handle = 0
+
+	def write(self, value, immediate=False):
+		if self.byteCost:
+			end = time.perf_counter()+self.byteCost
+			while time.perf_counter() < end:
+				pass
+		with self.lock:
+			now = self.clock()
+			self.bytesWritten += 1
+			if not self.firstWrite:
+				self.firstWrite = now
+			if immediate:
+				self.immediateBytes += 1
+			self._advance(now)
+			if value == 0x18:
+				self._flush(now)
+			elif value == 0x10:
+				if self.pausedAt is None:
+					self.pausedAt = now
+			elif value == 0x12:
+				self._resume(now)
+			elif value == 0x1e:
+				pass # marks the start of commands for the dll
+			elif value == 0x01:
+				self._endText()
+				self._command = ""
+			elif self._command is not None:
+				if 0x30 <= value <= 0x39:
+					self._command += chr(value)
+				else:
+					if self._command:
+						self._buffer.append((chr(value), int(self._command)))
+					self._command = None
+					if value == 0x0d:
+						self._speak(now)
+			elif value == 0x0d:
+				self._endText()
+				self._speak(now)
+			else:
+				self._text.append(value)
+
+	def read(self):
+		with self.lock:
+			self.reads += 1
+			self._advance(self.clock())
+			if self._ready:
+				return self._ready.popleft()
+			self.emptyReads += 1
+			return -1
+
+	def isSpeaking(self, now=None):
+		with self.lock:
+			if now is None:
+				now = self.clock()
+			return self.pausedAt is not None or now < self.busyUntil
+
+	def _endText(self):
+		if self._text:
+			self._buffer.append(("text", len(self._text)))
+			self._text = []
+
+	def _speak(self, now):
+		# the TT starts on a carriage return, after anything it is already saying
+		self.carriageReturns.append(now)
+		start = max(now, self.busyUntil) if self.pausedAt is None else max(self.pausedAt, self.busyUntil)
+		at = start
+		for kind, value in self._buffer:
+			if kind == "text":
+				at += value/(charsPerSecond(self.rate, self.variant)*self.speed)
+			elif kind == "i":
+				self._scheduled.append((at, value))
+			elif kind == "s":
+				self.rate = value
+			elif kind == "o":
+				self.variant = value
+			elif kind == "p":
+				self.pitch = value
+			elif kind == "v":
+				self.volume = value
+			elif kind == "e":
+				self.inflection = value
+		self._buffer = []
+		self.busyUntil = at
+		self.utteranceEnds.append(at)
+
+	def _advance(self, now):
+		if self.pausedAt is not None:
+			return
+		while self._scheduled and self._scheduled[0][0] <= now:
+			at, index = self._scheduled.popleft()
+			self._ready.append(index)
+			self.reached.append((index, at))
+
+	def _flush(self, now):
+		self.flushes.append(now)
+		self._buffer = []
+		self._text = []
+		self._command = None
+		self._scheduled.clear()
+		self._ready.clear()
+		if self.busyUntil > now and self.utteranceEnds:
+			self.utteranceEnds[-1] = now
+		self.busyUntil = now
+		self.pausedAt = None
+
+	def _resume(self, now):
+		if self.pausedAt is None:
+			return
+		# everything still to be said moves back by however long the TT was paused
+		pausedFor = now-self.pausedAt
+		self.pausedAt = None
+		self._scheduled = deque((at+pausedFor, index) for at, index in self._scheduled)
+		if self.busyUntil > now-pausedFor:
+			self.busyUntil += pausedFor
+			self.utteranceEnds[-1] = self.busyUntil
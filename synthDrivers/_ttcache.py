@@ -0,0 +1,86 @@
+#synthDrivers/_ttcache.py
+#A part of NonVisual Desktop Access (NVDA)
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# NVDA says the same short strings over and over while moving around, button, link, blank, list item counters and so on,
+# and each time speak ran them through the normalizer and encoded them again.  This keeps the bytes for the last few hundred of them.
+# What comes out of the normalizer only depends on the string, whether it is in character mode, and whether the string before it ended with a number,
+# so those are the key (and the user's pronunciation dictionary, which empties the cache when it changes), and the entry is the bytes to send, how many characters they are for the index thread, and previousMetric for the next string.
+# Only the text is kept, indexes and pitch changes still go through speak every time since they depend on the index ring and what the TT was last sent.
+# Long strings from say all hardly ever come round again so they aren't kept, that way the cache can't hold more than size*maxLength characters.
+# Only speak uses it so it doesn't need a lock.
+
+import time
+from collections import OrderedDict
+from ._ttnormalizer import normalize, blockControlChars, characterTable, toAscii
+from ._ttdictionary import PronunciationDictionary
+
+class EncodedTextCache(object):
+
+	def __init__(self, size=512, maxLength=256):
+		self.size = size
+		self.maxLength = maxLength
+		self.entries = OrderedDict() # least recently used first
+		self.dictionary = PronunciationDictionary() # the user's pronunciations, see _ttdictionary.py
+		# counters for seeing whether it is worth having
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		# seconds spent on the strings that weren't found, speak records how much each utterance added, see _ttmetrics.py
+		self.normalizeTime = 0.0
+		self.encodeTime = 0.0
+
+	def encode(self, text, characterMode, previousMetric):
+		# Returns the bytes for text, how many characters that is, and the previousMetric to use for the next string.
+		if characterMode:
+			previousMetric = False # the normalizer doesn't see character mode text so it doesn't matter what came before
+		key = (text, characterMode, previousMetric)
+		entry = self.entries.get(key)
+		if entry is not None:
+			self.entries.move_to_end(key)
+			self.hits += 1
+			return entry
+		start = time.perf_counter()
+		if characterMode:
+			if len(text) == 1:
+				text = text.translate(characterTable) # blocks control chars and names the upper half of Latin-1 in one go
+			else:
+				text = blockControlChars(text)
+			metric = False
+		else:
+			text = self.dictionary.apply(text)
+			# fix time, leading zeros, numbers with commas, money, metric units, dates like 21st, and words NVDA splits like McDonalds
+			text, metric = normalize(text, previousMetric)
+		normalized = time.perf_counter()
+		self.normalizeTime += normalized-start
+		encoded = toAscii(text).encode('ascii') # accented letters, smart quotes and dashes become something the TT can say
+		entry = (encoded, len(encoded), metric)
+		self.misses += 1
+		if len(key[0]) <= self.maxLength:
+			self.entries[key] = entry
+			if len(self.entries) > self.size:
+				self.entries.popitem(last=False)
+				self.evictions += 1
+		self.encodeTime += time.perf_counter()-normalized
+		return entry
+
+	def clear(self):
+		self.entries.clear()
+
+	def setDictionary(self, dictionary):
+		self.dictionary = dictionary
+		self.entries.clear()
+
+	def counters(self):
+		lookups = self.hits+self.misses
+		return {
+			"entries": len(self.entries),
+			"pronunciations": len(self.dictionary),
+			"hits": self.hits,
+			"misses": self.misses,
+			"evictions": self.evictions,
+			"hit rate": self.hits/lookups if lookups else 0.0,
+			"average miss us": (self.normalizeTime+self.encodeTime)/self.misses*1000000 if self.misses else 0.0,
+		}
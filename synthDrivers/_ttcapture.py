@@ -0,0 +1,136 @@
+#synthDrivers/_ttcapture.py
+#A part of NonVisual Desktop Access (NVDA)
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Records everything the driver writes to and reads from the TT with when it happened, so a problem a user has can be looked at and replayed
+# without their TT or their NVDA, see benchmarks/replay_capture.py.  It is off unless SynthDriver.startCapture is called.
+# RecordingTransport goes in front of the real transport and hands every call to a CaptureWriter, which packs it into a few bytes and writes the file in big pieces.
+# The file starts with magic and then one record after another:
+#   a byte for the kind of record, W, I or R
+#   the microseconds since the capture started as a varint, seven bits a byte low bits first with the top bit set on every byte but the last
+#   W  write_bytes: the length as a varint and the bytes, every 0x1e in them went to the dll through USBTT_WriteByteImmediate and the rest through USBTT_WriteByte
+#   I  write_immediate: the byte
+#   R  read_index: what USBTT_ReadByte gave back plus one so -1, nothing to read, is 0
+# Nearly every record is an empty read from the index thread or a short write, three or four bytes, so an hour of use is a few megabytes.
+
+import threading
+import time
+from ._tttransport import Transport
+
+magic = b"TTCAP1\n"
+WRITE = ord("W")
+IMMEDIATE = ord("I")
+READ = ord("R")
+
+def varint(value):
+	out = bytearray()
+	while value > 0x7f:
+		out.append(value & 0x7f | 0x80)
+		value >>= 7
+	out.append(value)
+	return out
+
+class CaptureWriter(object):
+
+	def __init__(self, path, bufferSize=65536):
+		self.path = path
+		self.bufferSize = bufferSize
+		self.file = open(path, "wb")
+		self.file.write(magic)
+		self.buffer = bytearray()
+		self.lock = threading.Lock() # writes are made with deviceLock held but the index thread reads without it
+		self.start = time.perf_counter()
+		self.records = 0
+
+	def record(self, kind, payload):
+		record = varint(int((time.perf_counter()-self.start)*1000000))
+		record[0:0] = bytes((kind,))
+		record += payload
+		with self.lock:
+			if self.file is None: # closed while the index thread was reading
+				return
+			self.buffer += record
+			self.records += 1
+			if len(self.buffer) >= self.bufferSize:
+				self.file.write(self.buffer)
+				del self.buffer[:]
+
+	def close(self):
+		with self.lock:
+			if self.file is None:
+				return
+			self.file.write(self.buffer)
+			del self.buffer[:]
+			self.file.close()
+			self.file = None
+
+class RecordingTransport(Transport):
+
+	def __init__(self, inner, writer):
+		self.inner = inner
+		self.writer = writer
+
+	# the counters for _ttmetrics.py are the ones on the transport being recorded
+	@property
+	def bytesWritten(self):
+		return self.inner.bytesWritten
+
+	@property
+	def immediateBytes(self):
+		return self.inner.immediateBytes
+
+	def write_bytes(self, data):
+		self.inner.write_bytes(data)
+		self.writer.record(WRITE, varint(len(data))+data)
+
+	def write_immediate(self, byte):
+		self.inner.write_immediate(byte)
+		self.writer.record(IMMEDIATE, bytes((byte,)))
+
+	def read_index(self):
+		value = self.inner.read_index()
+		self.writer.record(READ, bytes(((value+1) & 0xff,)))
+		return value
+
+def readCapture(path):
+	# Yields (kind, seconds since the capture started, payload), payload is the bytes for W and a number for I and R.
+	with open(path, "rb") as f:
+		data = f.read()
+	if not data.startswith(magic):
+		raise ValueError("%s is not a TripleTalk capture" % path)
+	position = len(magic)
+	end = len(data)
+	def readVarint():
+		nonlocal position
+		value = 0
+		shift = 0
+		while True:
+			byte = data[position]
+			position += 1
+			value |= (byte & 0x7f) << shift
+			if not byte & 0x80:
+				return value
+			shift += 7
+	while position < end:
+		kind = data[position]
+		position += 1
+		try:
+			at = readVarint()/1000000
+			if kind == WRITE:
+				length = readVarint()
+				if position+length > end:
+					return # cut off part way through, NVDA was closed without stopping the capture
+				payload = data[position:position+length]
+				position += length
+			elif kind in (IMMEDIATE, READ):
+				payload = data[position]
+				position += 1
+				if kind == READ:
+					payload -= 1
+			else:
+				raise ValueError("%s has an unknown record at byte %d" % (path, position-1))
+		except IndexError:
+			return
+		yield kind, at, payload
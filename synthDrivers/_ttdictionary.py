@@ -0,0 +1,91 @@
+#synthDrivers/_ttdictionary.py
+#A part of NonVisual Desktop Access (NVDA)
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# The user's own pronunciation fixes, kept in ttusb.dic in the NVDA user config directory, see doc/en/readme.txt.
+# Each entry is either a whole word or text to replace anywhere, even inside a word, and matching ignores case.
+# All the entries are compiled into one regex when the synth loads so a string is gone through once however many entries there are.
+# A plain alternation of thousands of words would have the regex engine try every one of them at every position, so the entries are
+# put into a trie first and the regex follows it, at each position it only goes as deep as the text matches an entry, the longest match wins.
+# The dictionary runs on a string before the normalizer so what it puts in gets the same time, money and number fixups as everything else.
+
+import re
+
+def _trieRegex(node):
+	# node maps each next character to the node after it, "" is there when an entry ends here
+	branches = [re.escape(character)+_trieRegex(child) for character, child in sorted(node.items()) if character]
+	if not branches:
+		return ""
+	if len(branches) == 1 and "" not in node:
+		return branches[0]
+	guard = ""
+	if len(branches) > 2:
+		# the regex engine tries the branches one after the other, a character set checks the next character against all of them at once
+		guard = "(?=[%s])" % "".join(re.escape(character) for character in sorted(node) if character)
+	return "%s(?:%s)%s" % (guard, "|".join(branches), "?" if "" in node else "")
+
+def _compile(patterns):
+	trie = {}
+	for pattern in patterns:
+		node = trie
+		for character in pattern:
+			node = node.setdefault(character, {})
+		node[""] = True
+	return _trieRegex(trie)
+
+class PronunciationDictionary(object):
+
+	def __init__(self, entries=()):
+		# entries are (text to find, what to say instead, whether it only matches a whole word), a later entry for the same text replaces an earlier one
+		self.words = {}
+		self.substrings = {}
+		for pattern, replacement, wholeWord in entries:
+			if pattern:
+				(self.words if wholeWord else self.substrings)[pattern.lower()] = replacement
+		alternatives = []
+		if self.words:
+			alternatives.append(r"(?<!\w)(?P<word>%s)(?!\w)" % _compile(self.words))
+		if self.substrings:
+			alternatives.append(r"(?P<substring>%s)" % _compile(self.substrings))
+		self.regex = re.compile("|".join(alternatives), re.IGNORECASE) if alternatives else None
+		# ignoring case the regex also matches characters that lower doesn't turn into the ones in the entry, like ſ for s or the kelvin sign for k, casefold does
+		self.foldedWords = {pattern.casefold(): replacement for pattern, replacement in self.words.items()}
+		self.foldedSubstrings = {pattern.casefold(): replacement for pattern, replacement in self.substrings.items()}
+
+	def __len__(self):
+		return len(self.words)+len(self.substrings)
+
+	def apply(self, text):
+		if self.regex is None:
+			return text
+		return self.regex.sub(self._replace, text)
+
+	def _replace(self, match):
+		text = match.group()
+		if match.lastgroup == "word":
+			replacements, folded = self.words, self.foldedWords
+		else:
+			replacements, folded = self.substrings, self.foldedSubstrings
+		replacement = replacements.get(text.lower())
+		if replacement is None:
+			replacement = folded.get(text.casefold(), text)
+		return replacement
+
+def load(path):
+	# One entry a line: the text to find, a tab, what to say instead, and optionally another tab and anywhere to replace it inside words as well.
+	# Blank lines and lines starting with # are skipped.  Returns the dictionary and a message for each line that couldn't be used.
+	entries = []
+	errors = []
+	with open(path, encoding="utf-8-sig") as f:
+		for lineNumber, line in enumerate(f, 1):
+			line = line.rstrip("\r\n")
+			if not line.strip() or line.startswith("#"):
+				continue
+			fields = line.split("\t")
+			if len(fields) < 2 or not fields[0] or (len(fields) > 2 and fields[2].strip().lower() not in ("", "word", "anywhere")):
+				errors.append("%s line %d: expected the text to find, a tab, what to say instead, and optionally a tab and word or anywhere" % (path, lineNumber))
+				continue
+			entries.append((fields[0], fields[1], len(fields) < 3 or fields[2].strip().lower() != "anywhere"))
+	return PronunciationDictionary(entries), errors
@@ -0,0 +1,140 @@
+#synthDrivers/_ttindexes.py
+#A part of NonVisual Desktop Access (NVDA)
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# The TT only has indexes 0-99 so the indexes sent to it go round a ring and each slot remembers the NVDA index that goes with it.
+# The indexes from oldest up to but not including next have been sent and not come back yet, a slot is never reused while it is one of them.
+# When all 100 are out speak waits for the TT to catch up before starting an utterance, and an utterance with too many indexes to fit
+# has the extra ones dropped. NVDA treats every index before the one it is told about as reached so a dropped index is covered by the next one that is sent,
+# the last one dropped in an utterance goes with the index that marks its end.
+# An index coming back from the TT that isn't out, from before a flush or a slot that has been reused, is ignored.
+
+import threading
+
+class IndexRing(object):
+	size = 100
+
+	def __init__(self):
+		self.nvdaIndexes = [None] * self.size # the NVDA index to report for each slot, None for an end of utterance that has nothing to report
+		self.doneSpeaking = [False] * self.size # True for the index at the end of each utterance
+		self.chars = [0] * self.size # how many characters of speech come before each index since the previous one or the start of its utterance
+		self.sentTimes = [0] * self.size # when the utterance with each index was sent
+		self.oldest = 0
+		self.next = 0
+		self.outstanding = 0
+		self.condition = threading.Condition(threading.Lock()) # a plain lock is quicker than the default RLock and nothing here takes it twice
+		self._droppedIndex = None
+		self._droppedChars = 0
+		# counters for looking at how full the ring gets
+		self.sent = 0
+		self.received = 0
+		self.peak = 0 # the most indexes that have been out at once
+		self.waits = 0 # how many times speak had to wait for room
+		self.timeouts = 0 # how many of those waits gave up
+		self.dropped = 0 # NVDA indexes that were never sent because the ring was full
+		self.merged = 0 # indexes that were never sent because they were too close to the one before and it was moved instead
+		self.stale = 0 # indexes the TT sent back that weren't out
+
+	def reserve(self, count, timeout):
+		# Wait until there is room for count indexes, or the ring is empty if there will never be room for that many.
+		# Gives up after timeout seconds so a TT that stops sending indexes back can't hang speak, anything that doesn't fit is dropped.
+		count = min(count, self.size)
+		if self.size-self.outstanding >= count: # outstanding only goes down behind our back so this can't be wrong
+			return True
+		with self.condition:
+			if self.size-self.outstanding >= count:
+				return True
+			self.waits += 1
+			if not self.condition.wait_for(lambda: self.size-self.outstanding >= count, timeout):
+				self.timeouts += 1
+				return False
+			return True
+
+	def add(self, nvdaIndex, chars, sentTime):
+		# Returns the TT index to send for nvdaIndex or -1 if it has to be dropped.
+		# The last free slot is kept for the end of the utterance.
+		with self.condition:
+			if self.size-self.outstanding <= 1:
+				self.dropped += 1
+				self._droppedIndex = nvdaIndex
+				self._droppedChars += chars
+				return -1
+			return self._add(nvdaIndex, False, chars, sentTime)
+
+	def addDoneSpeaking(self, chars, sentTime):
+		# The index for the end of an utterance, it also reports the last NVDA index dropped from the utterance if there was one.
+		with self.condition:
+			nvdaIndex = self._droppedIndex
+			if self.outstanding == self.size:
+				if nvdaIndex is not None:
+					self.dropped += 1
+				self._droppedIndex = None
+				self._droppedChars = 0
+				return -1
+			return self._add(nvdaIndex, True, chars, sentTime)
+
+	def _add(self, nvdaIndex, doneSpeaking, chars, sentTime):
+		index = self.next
+		self.nvdaIndexes[index] = nvdaIndex
+		self.doneSpeaking[index] = doneSpeaking
+		self.chars[index] = chars+self._droppedChars
+		self.sentTimes[index] = sentTime
+		self._droppedIndex = None
+		self._droppedChars = 0
+		self.next = (index+1) % self.size
+		self.outstanding += 1
+		self.sent += 1
+		if self.outstanding > self.peak:
+			self.peak = self.outstanding
+		return index
+
+	def merge(self, nvdaIndex, chars, doneSpeaking=False):
+		# Moves the index given out last on by chars to stand for nvdaIndex as well as the one it had, None keeps the one it had.
+		# It can only be moved before it is written to the TT and only while nothing has been given out after it.
+		with self.condition:
+			index = (self.next-1) % self.size
+			if nvdaIndex is not None:
+				self.nvdaIndexes[index] = nvdaIndex
+			if doneSpeaking:
+				self.doneSpeaking[index] = True
+			self.chars[index] += chars
+			self.merged += 1
+			return index
+
+	def reached(self, index):
+		# The TT has reached index so it and every index sent before it are no longer out.
+		# Returns the NVDA index for it and whether it is the end of an utterance, or None if index wasn't out.
+		with self.condition:
+			if not 0 <= index < self.size or (index-self.oldest) % self.size >= self.outstanding:
+				self.stale += 1
+				return None
+			count = (index-self.oldest) % self.size+1
+			self.outstanding -= count
+			self.received += count
+			self.oldest = (index+1) % self.size
+			self.condition.notify_all()
+			return self.nvdaIndexes[index], self.doneSpeaking[index]
+
+	def clear(self):
+		# after a flush nothing that was sent is coming back
+		with self.condition:
+			self.oldest = self.next
+			self.outstanding = 0
+			self._droppedIndex = None
+			self._droppedChars = 0
+			self.condition.notify_all()
+
+	def counters(self):
+		return {
+			"outstanding": self.outstanding,
+			"peak": self.peak,
+			"sent": self.sent,
+			"received": self.received,
+			"waits": self.waits,
+			"timeouts": self.timeouts,
+			"dropped": self.dropped,
+			"merged": self.merged,
+			"stale": self.stale,
+		}
@@ -0,0 +1,83 @@
+#synthDrivers/_ttmetrics.py
+#A part of NonVisual Desktop Access (NVDA)
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# How long each part of getting an utterance out takes, kept all the time so a slow TT can be looked into without changing the driver.
+# Every phase keeps its last few hundred times and the percentiles are only worked out when someone asks for them, so recording a time is just an append.
+# Each phase is only ever recorded from one thread at a time so there is no lock, see where ttusb.py records them.
+#   normalize    the normalizer and the pronunciation dictionary for the strings of an utterance that weren't in the cache, utterances that were all cached aren't counted
+#   encode       making those strings ASCII and encoding them, same as normalize
+#   params       working out the parameter commands that go in front of the utterance
+#   speak        all of speak, from NVDA handing over the sequence until it returns
+#   transmit     from speak handing bytes to the writer until the last of them has been written to the TT
+#   first index  from speak being handed the sequence until the first of its indexes comes back from the TT
+#   done         from speak being handed the sequence until the index at the end of it comes back
+# Times are in seconds here and in milliseconds in snapshot and report.
+
+from collections import deque
+
+phases = ("normalize", "encode", "params", "speak", "transmit", "first index", "done")
+
+class Histogram(object):
+
+	def __init__(self, size=500):
+		self.samples = deque(maxlen=size) # the latest times, older ones fall off the front
+		self.count = 0 # every time ever added, not just the ones still kept
+		self.total = 0.0
+
+	def add(self, seconds):
+		self.samples.append(seconds)
+		self.count += 1
+		self.total += seconds
+
+	def summary(self):
+		samples = sorted(self.samples)
+		if not samples:
+			return {"count": self.count}
+		def percentile(fraction):
+			return samples[min(len(samples)-1, int(len(samples)*fraction))]*1000
+		return {
+			"count": self.count,
+			"mean": self.total/self.count*1000,
+			"p50": percentile(0.5),
+			"p95": percentile(0.95),
+			"p99": percentile(0.99),
+			"max": samples[-1]*1000,
+		}
+
+class Metrics(object):
+
+	def __init__(self, size=500):
+		self.size = size
+		self.reset()
+
+	def reset(self):
+		self.histograms = {phase: Histogram(self.size) for phase in phases}
+
+	def record(self, phase, seconds):
+		self.histograms[phase].add(seconds)
+
+	def snapshot(self, counters=None):
+		# a dict of the summary of every phase, and the counters passed in under "counters" so everything can be read in one go
+		result = {phase: self.histograms[phase].summary() for phase in phases}
+		result["counters"] = dict(counters or {})
+		return result
+
+	def report(self, counters=None):
+		# the snapshot as lines of text for the log
+		snapshot = self.snapshot(counters)
+		lines = ["%-12s %8s %9s %9s %9s %9s %9s" % ("phase ms", "count", "mean", "p50", "p95", "p99", "max")]
+		for phase in phases:
+			summary = snapshot[phase]
+			if len(summary) == 1:
+				lines.append("%-12s %8d" % (phase, summary["count"]))
+			else:
+				lines.append("%-12s %8d %9.3f %9.3f %9.3f %9.3f %9.3f" % (phase, summary["count"], summary["mean"], summary["p50"], summary["p95"], summary["p99"], summary["max"]))
+		for name, value in snapshot["counters"].items():
+			if isinstance(value, float):
+				lines.append("%-24s %12.3f" % (name, value))
+			else:
+				lines.append("%-24s %12d" % (name, value))
+		return "\n".join(lines)
@@ -0,0 +1,458 @@
+#synthDrivers/_ttnormalizer.py
+#A part of NonVisual Desktop Access (NVDA)
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Text fixups for the TripleTalk.  This used to live inline in SynthDriver.speak, it doesn't import anything from NVDA so it can be used and measured on its own.
+# The leading underscore keeps NVDA from trying to load this module as a synth driver.
+# Instead of looking at every character in python a precompiled regex finds the only characters that can start a fixup and everything between them is copied with slicing.
+# The lookbehinds only throw away characters that can never trigger a fixup (a period, comma, or ordinal suffix right after a letter, a colon after a letter that isn't followed by a zero,
+# a space after a space or a letter other than the c in Mc)
+# so the result is exactly what the old per character loop produced.
+# This has to stay linear in the length of the text since say all can hand us a whole spreadsheet row at once.  A fixup that scans forward returns where it stopped and the
+# search picks up from there, the only backward scans are over the spaces right before an ordinal suffix, and a run of zeros is only looked at from its first zero,
+# so every character is looked at a fixed number of times.  benchmarks/bench_scaling.py checks this.
+
+import re
+import unicodedata
+
+# Block everything below 32.  The TT dll does some of this, but it can't block the control char 0x01, flush 0x18, etc and allowing these in the text would cause problems with the synth.
+controlTable = {code: " " for code in range(32)}
+controlChars = re.compile("[\x00-\x1f]")
+
+# names for the upper half of Latin-1 and Windows-1252 which the TT can't say when a single character is spoken
+upperAscii = {
+	128:"euro",
+	129:"",
+	130:"single low-9 quote",
+	131:"f hook",
+	132:"double low-9 quote",
+	133:"horizontal ellipsis",
+	134:"dagger",
+	135:"double dagger",
+	136:"circumflex accent",
+	137:"per mille",
+	138:"S caron",
+	139:"single left-pointing angle quote",
+	140:"ligature OE",
+	141:"",
+	142:"Z caron",
+	143:"",
+	144:"",
+	145:"left single quote",
+	146:"right single quote",
+	147:"left double quote",
+	148:"right double quote",
+	149:"bullet",
+	150:"en dash",
+	151:"em dash",
+	152:"tilde",
+	153:"trade mark",
+	154:"S caron",
+	155:"single right-pointing angle quote",
+	156:"ligature oe",
+	157:"",
+	158:"z caron",
+	159:"Y diaeresis",
+	160:"non-breaking space",
+	161:"inverted exclamation mark",
+	162:"cents",
+	163:"pound",
+	164:"currency",
+	165:"yen",
+	166:"pipe broken vertical bar",
+	167:"section",
+	168:"spacing diaeresis – umlaut",
+	169:"copyright",
+	170:"feminine ordinal",
+	171:"left double-angle quotes",
+	172:"egation",
+	173:"soft hyphen",
+	174:"registered trademark",
+	175:"spacing macron – overline",
+	176:"degree",
+	177:"plus-or-minus",
+	178:"superscript two",
+	179:"superscript three",
+	180:"acute accent",
+	181:"micro",
+	182:"pilcrow",
+	183:"middle dot",
+	184:"spacing cedilla",
+	185:"superscript one",
+	186:"masculine ordinal",
+	187:"right double-angle quotes",
+	188:"one quarter",
+	189:"one half",
+	190:"three quarters",
+	191:"inverted question mark",
+	192:"A grave",
+	193:"A acute",
+	194:"A circumflex",
+	195:"A tilde",
+	196:"A diaeresis",
+	197:"A ring above",
+	198:"A E",
+	199:"C cedilla",
+	200:"E grave",
+	201:"E acute",
+	202:"E circumflex",
+	203:"E diaeresis",
+	204:"I grave",
+	205:"I acute",
+	206:"I circumflex",
+	207:"I diaeresis",
+	208:"ETH",
+	209:"N tilde",
+	210:"O grave",
+	211:"O acute",
+	212:"O circumflex",
+	213:"O tilde",
+	214:"O diaeresis",
+	215:"times",
+	216:"O a slash",
+	217:"U grave",
+	218:"U acute",
+	219:"U circumflex",
+	220:"U diaeresis",
+	221:"Y acute",
+	222:"THORN",
+	223:"sharp s",
+	224:"a grave",
+	225:"a acute",
+	226:"a circumflex",
+	227:"a tilde",
+	228:"a diaeresis",
+	229:"a ring above",
+	230:"a e",
+	231:"c cedilla",
+	232:"e grave",
+	233:"e acute",
+	234:"e circumflex",
+	235:"e diaeresis",
+	236:"i grave",
+	237:"i acute",
+	238:"i circumflex",
+	239:"i diaeresis",
+	240:"eth",
+	241:"n tilde",
+	242:"o grave",
+	243:"o acute",
+	244:"o circumflex",
+	245:"o tilde",
+	246:"o dia,eresis",
+	247:"divided",
+	248:"o slash",
+	249:"u grave",
+	250:"u acute",
+	251:"u circumflex",
+	252:"u diaeresis",
+	253:"y acute",
+	254:"thorn,",
+	255:"y diaeresis" }
+
+# everything from 0 to 255 for character mode, control chars become a space and the upper half gets its name
+characterTable = dict(controlTable)
+characterTable.update(upperAscii)
+
+def _windows1252(code):
+	# the character NVDA hands us for byte code in Windows-1252, None for the five codes it leaves out
+	try:
+		return bytes([code]).decode("cp1252")
+	except UnicodeDecodeError:
+		return None
+
+# upperAscii names 128-159 by their Windows-1252 bytes but NVDA sends unicode, so the euro sign comes to us as U+20AC and not 128
+for code in range(128, 160):
+	if _windows1252(code) and upperAscii[code]:
+		characterTable[ord(_windows1252(code))] = upperAscii[code]
+
+# Everything the TT gets goes through encode('ascii', 'replace') which turned every accented letter, smart quote and dash in normal reading into a question mark.
+# Before encoding, text goes through asciiTable with translate.  Punctuation that has a plain ASCII version gets that, the rest falls back to
+# the compatibility decomposition without its accents (e acute to e, the ligature fi to fi, superscript two to 2, a thin space to a space),
+# then to the upperAscii name for a Latin-1 or Windows-1252 symbol with spaces around it, and only then to the question mark encode would have given.
+readingPunctuation = {
+	"\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201b": "'", "\u2032": "'", "\u2039": "'", "\u203a": "'",
+	"\u201c": '"', "\u201d": '"', "\u201e": '"', "\u201f": '"', "\u2033": '"', "\xab": '"', "\xbb": '"',
+	"\u2010": "-", "\u2011": "-", "\u2012": "-", "\u2013": "-", "\u2212": "-", "\u2014": " - ", "\u2015": " - ",
+	"\xad": "", "\u200b": "", "\u200c": "", "\u200d": "", "\u2060": "", "\ufeff": "", # soft hyphen and the zero width ones
+	"\u2022": " ", "\xb7": " ", "\xa1": "", "\xbf": "", # bullets and the upside down marks at the start of a Spanish sentence
+	"\u02c6": "^", "\u02dc": "~",
+	# letters that don't decompose
+	"\xdf": "ss", "\xe6": "ae", "\xc6": "AE", "\u0153": "oe", "\u0152": "OE", "\xf8": "o", "\xd8": "O", "\xf0": "d", "\xd0": "D",
+	"\xfe": "th", "\xde": "Th", "\u0142": "l", "\u0141": "L", "\u0111": "d", "\u0110": "D", "\u0131": "i",
+}
+
+readingNames = {}
+for code in range(128, 256):
+	if _windows1252(code) and upperAscii[code]:
+		readingNames[_windows1252(code)] = " %s " % upperAscii[code]
+
+def _asciiFallback(character):
+	if character in readingPunctuation:
+		return readingPunctuation[character]
+	decomposed = "".join(part for part in unicodedata.normalize("NFKD", character) if not unicodedata.combining(part))
+	if decomposed and decomposed.isascii():
+		return blockControlChars(decomposed)
+	return toAscii(readingNames.get(character, "?")) # a few of the names have a dash in them
+
+class _AsciiTable(dict):
+	# translate looks up every character of the text here, a character that isn't in it yet is worked out once and kept
+	def __missing__(self, code):
+		replacement = self[code] = _asciiFallback(chr(code))
+		return replacement
+
+asciiTable = _AsciiTable((code, chr(code)) for code in range(128))
+
+def toAscii(text):
+	# Only ASCII comes back so encoding the result can't give a question mark that isn't meant.
+	if text.isascii():
+		return text
+	return text.translate(asciiTable)
+
+# the bytes sent to the TT for a single character in character mode so typing echo doesn't have to translate and encode anything
+characterBytes = {chr(code): toAscii(chr(code).translate(characterTable)).encode('ascii') for code in range(256)}
+characterBytes.update((chr(code), toAscii(name).encode('ascii')) for code, name in characterTable.items() if code > 255)
+
+def blockControlChars(text):
+	# translate only has a fast path for pure ASCII text, for anything else the regex is quicker than a dict lookup per character
+	if text.isascii():
+		return text.translate(controlTable)
+	return controlChars.sub(" ", text)
+
+triggers = re.compile(
+	r"(?<![A-Za-z])(?:[nNrR](?=[dD])|[sS](?=[tT])|[tT](?=[hH]))" # date stuff like 21st 22nd 23rd 24th
+	r"|(?<![A-Za-z])[.,]" # decimal points and commas in numbers
+	r"|(?<![ A-Zabd-z]) " # metric units after numbers and words like McDonalds
+	r"|\$|(?<![A-Za-z]):|:(?=0)" # money and time
+	r"|(?:^|(?<= ))0" # leading zeros
+)
+
+def normalize(text, previousMetric=False):
+	# Returns the fixed up text and whether the text ended with a number followed by spaces so the next string can be handled.
+	textLen = len(text)
+	replacements = {}
+	if previousMetric and textLen and text[0].isnumeric():
+		# the previous string ended with a number so put a space at the beginning of this one as not to run numbers together
+		# We have to do it this way instead of just adding a space at the end of the previous string while processing it
+		# because programs like excel can send something like "28  " "l 16  " in two separate strings
+		# and our metric processing would turn it into "28" "l 16" blocking the metric processing, but if the next string
+		# starts with a number we have to prefix it with a space
+		# if we do it while processing the previous string we'll get "28 " "l 16 " which won't block the metric processing
+		replacements[0] = " " + text[0]
+	previousMetric = False
+	match = triggers.search(text)
+	while match:
+		index = match.start()
+		element = text[index]
+		if element == ' ':
+			skipTo = _fixSpace(text, textLen, index, replacements)
+			if skipTo == textLen: # set previousMetric since we are at the end of this string so we can handle it at the beginning of the next string
+				previousMetric = True
+		else:
+			skipTo = fixers[element](text, textLen, index, replacements)
+		# skip the indexes we already processed for point, comma, leading zeros, money, metric stuff, or date stuff
+		match = triggers.search(text, skipTo if skipTo > index else index+1)
+	if replacements:
+		text = _applyReplacements(text, replacements)
+	return blockControlChars(text), previousMetric
+
+def _applyReplacements(text, replacements):
+	# Nearly always the fixups write their replacements front to back so the text between them can be copied with slices.
+	# A few of them write behind where they started (21 st, 6: g, 00:) and then it is a plain list of the characters, either way this stays linear without sorting.
+	pieces = []
+	start = 0
+	for index, replacement in replacements.items():
+		if index < start:
+			textList = list(text)
+			for index, replacement in replacements.items():
+				textList[index] = replacement
+			return "".join(textList)
+		pieces.append(text[start:index])
+		pieces.append(replacement)
+		start = index+1
+	pieces.append(text[start:])
+	return "".join(pieces)
+
+def _fixOrdinal(text, textLen, index, replacements):
+	# prevent the synth from doing date stuff like 21st being twenty first instead of 21 st etc.
+	tempIndex = index-1
+	while tempIndex >= 0 and text[tempIndex] == ' ':
+		tempIndex -= 1
+	if tempIndex >= 0 and text[tempIndex].isnumeric():
+		replacements[tempIndex] = text[tempIndex] + ","
+		return index+2 # skip the chars we just processed
+	return 0
+
+def _fixPoint(text, textLen, index, replacements):
+	# make it pronounce decimals correctly
+	if index == 0 or ((text[index-1].isnumeric() or text[index-1] == ' ') and index+1 < textLen):
+		replacements[index] = " point "
+		index += 1
+		while index < textLen and text[index] == '0':
+			replacements[index] = "o "
+			index += 1
+		return index
+	return 0
+
+def _fixComma(text, textLen, index, replacements):
+	# remove the comma character only when it is in a number so the synthesizer says numbers correctly
+	# this only seems to matter if you set nopauses=1 in ttusbd.ini in the windows directory
+	if index == 0 or not text[index-1].isnumeric():
+		return 0
+	commaIndex = index
+	numDigits = 0
+	while index < textLen:
+		element = text[index]
+		if element.isnumeric():
+			numDigits += 1
+		elif element == ',':
+			if numDigits == 3 or (numDigits == 0 and index+1 < textLen and text[index+1].isalpha()):
+			# the second half of this if is for metric processing
+				replacements[commaIndex] = ""
+			elif numDigits > 0:
+				replacements[commaIndex] = " "
+			numDigits = 0
+			commaIndex = index
+		else:
+			break
+		index += 1
+	if numDigits == 3:
+		replacements[commaIndex] = ""
+	elif numDigits > 0:
+		replacements[commaIndex] = " "
+	return index
+
+def _fixSpace(text, textLen, index, replacements):
+	# stop the synth from saying metric items like liter, gram, etc and fix words like McDonalds
+	if index >= 2 and text[index-1] == 'c' and text[index-2] == 'M':
+		# NVDA splitting words of mixed case is bad for things like McDonalds so prevent it
+		replacements[index] = ""
+	elif index > 1 and text[index-2].isnumeric() and index+1 < textLen and text[index+1].isalpha() and (text[index-1] == ':' or text[index-1] == ','):
+		replacements[index-1] = ""
+		replacements[index] = ""
+	elif index > 0 and text[index-1].isnumeric():
+		while index < textLen and text[index] == ' ':
+			replacements[index] = ""
+			index += 1
+		if index < textLen and text[index].isnumeric(): # don't run numbers previously separated by spaces together
+			replacements[index-1] = " "
+		return index
+	return 0
+
+def _fixMoney(text, textLen, index, replacements):
+	# fix issues the synth has pronouncing money
+	pointNotFound = True
+	if index > 0 and not text[index-1] == ' ':
+		replacements[index] = " $"
+	index += 1
+	while index < textLen:
+		element = text[index]
+		if element == ',':
+			if index+1 < textLen:
+				replacements[index] = ""
+		elif element == '.':
+			pointNotFound = False
+			if index+3 < textLen and text[index+1].isnumeric() and text[index+2].isnumeric() and text[index+3].isnumeric():
+				tempIndex = index+1
+				isLeadingZero = True
+				moneyString = [" and "] # a list so a very long run of cents can't turn into repeated string copies
+				while tempIndex < textLen and text[tempIndex].isnumeric():
+					replacements[tempIndex] = ""
+					if text[tempIndex] == '0' and isLeadingZero:
+						moneyString.append("zero ")
+					else:
+						isLeadingZero = False
+					if text[tempIndex] > '0':
+						moneyString.append(text[tempIndex])
+					tempIndex += 1
+				moneyString.append(" cents ")
+				replacements[tempIndex-1] = "".join(moneyString)
+				index = tempIndex-1
+			elif index+2 < textLen and text[index+1] == '0' and (text[index+2] == '0' or not text[index+2].isnumeric()):
+				replacements[index+1] = ""
+				if text[index+2] >= ' ': # a control character here still gets blocked below
+					replacements[index+2] = ""
+			elif index+2 < textLen and text[index+1].isnumeric() and text[index+1] > '0' and not text[index+2].isnumeric():
+				replacements[index+1] = " and " + text[index+1] + "0 cents "
+			elif index+2 < textLen and text[index+1] == '0' and text[index+2] == '1':
+				replacements[index+1] = "and 1 cent"
+				replacements[index+2] = ""
+			elif index+2 < textLen and text[index+1].isnumeric() and text[index+2].isnumeric():
+				if text[index+1] == '0':
+					replacements[index+1] = " and " + text[index+2] + " cents "
+				else:
+					replacements[index+1] = " and " + text[index+1] + text[index+2] + " cents "
+				replacements[index+2] = ""
+		elif not element.isnumeric():
+			break
+		index += 1
+	if pointNotFound:
+		if index+1 < textLen and text[index] == ' ' and text[index+1].isalpha():
+			if text[index+1] not in "bBmM":
+				replacements[index] = ". "
+				index += 2
+			elif text[index+1] in "bB" and index+2 < textLen and text[index+2] in "yY":
+				replacements[index] = ". "
+				index += 3
+		elif index < textLen and text[index].isalpha():
+			if text[index] not in "bBmM":
+				replacements[index] = "." + text[index]
+				index += 1
+			elif text[index] in "bB" and index+1 < textLen and text[index+1] in "yY":
+				replacements[index] = "." + text[index]
+				index += 2
+	return index
+
+def _fixTime(text, textLen, index, replacements):
+	# fix so that the synthesizer says time correctly
+	if index > 0 and text[index-1].isnumeric() and index+1 < textLen and text[index+1].isalpha(): # this is for metric processing
+		replacements[index] = ""
+		return 0
+	allowOClock = True
+	hasSeconds = index >= 3 and text[index-3] == ':'
+	if index >= 2 and text[index-1] == '0' and text[index-2] == '0' and not hasSeconds:
+		replacements[index-2] = ""
+	if index == 0 or text[index-1] == '0':
+		allowOClock = False
+	if index >= 2 and text[index-2] == '1': #for 10 o clock
+		allowOClock = True
+	if index+2 < textLen and text[index+1] == '0':
+		if allowOClock and not hasSeconds:
+			if text[index+2].isnumeric():
+				replacements[index+1] = "o "
+			if text[index+2] == '0':
+				replacements[index+2] = "clock "
+		else:
+			replacements[index+1] = "zero "
+			if text[index+2] == '0':
+				replacements[index+2] = "zero "
+	return 0
+
+def _fixZeros(text, textLen, index, replacements):
+	# make it report leading zeros for numbers
+	if index > 0 and (index+1 >= textLen or text[index+1] == ' '):
+		return 0
+	tempIndex = index
+	while tempIndex < textLen:
+		if text[tempIndex] == ':':
+			return 0 # don't do leading zeros on time
+		elif text[tempIndex] != '0':
+			break
+		tempIndex += 1
+	if tempIndex+1 < textLen and text[tempIndex+1] != ':':
+		for zeroIndex in range(index, tempIndex):
+			replacements[zeroIndex] = "zero "
+		return tempIndex
+	return 0
+
+fixers = {
+	'.': _fixPoint,
+	',': _fixComma,
+	'$': _fixMoney,
+	':': _fixTime,
+	'0': _fixZeros,
+}
+for element in "nNrRsStT":
+	fixers[element] = _fixOrdinal
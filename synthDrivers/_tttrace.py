@@ -0,0 +1,56 @@
+#synthDrivers/_tttrace.py
+#A part of NonVisual Desktop Access (NVDA)
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# A timeline of what speak, cancel, the writer thread and the index thread were doing, for tracking down stutters and races between them.
+# It is off unless SynthDriver.startTrace is called, until then every place that records something only checks ttusb.tracer is None.
+# Events go into a ring of the last size of them so it can be left running, appending to a deque is safe from any thread without a lock.
+# export writes them in the Chrome trace event format, open the file in chrome://tracing or https://ui.perfetto.dev to see each thread on its own line.
+
+import json
+import threading
+import time
+from collections import deque
+
+class TraceRecorder(object):
+
+	def __init__(self, size=100000):
+		self.events = deque(maxlen=size) # (type, name, start, duration, thread, args), times in seconds from perf_counter
+		self.threadNames = {}
+
+	def _thread(self):
+		thread = threading.get_ident()
+		if thread not in self.threadNames:
+			self.threadNames[thread] = threading.current_thread().name
+		return thread
+
+	def span(self, name, start, args=None):
+		# something that started at start and has just finished
+		now = time.perf_counter()
+		self.events.append(("X", name, start, now-start, self._thread(), args))
+
+	def instant(self, name, args=None):
+		self.events.append(("i", name, time.perf_counter(), 0, self._thread(), args))
+
+	def counter(self, name, values):
+		# values is a dict of numbers, the viewer draws each one as a graph over time
+		self.events.append(("C", name, time.perf_counter(), 0, self._thread(), values))
+
+	def traceEvents(self):
+		events = [{"ph": "M", "name": "thread_name", "pid": 1, "tid": thread, "args": {"name": name}} for thread, name in list(self.threadNames.items())]
+		for kind, name, start, duration, thread, args in list(self.events):
+			event = {"ph": kind, "name": name, "ts": start*1000000, "pid": 1, "tid": thread}
+			if kind == "X":
+				event["dur"] = duration*1000000
+			elif kind == "i":
+				event["s"] = "t"
+			if args:
+				event["args"] = args
+			events.append(event)
+		return events
+
+	def export(self, path):
+		with open(path, "w", encoding="utf-8") as f:
+			json.dump({"traceEvents": self.traceEvents(), "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,104 @@
+#synthDrivers/_tttransport.py
+#A part of NonVisual Desktop Access (NVDA)
+#TripleTalk USB Driver
+#This file is covered by the GNU General Public License.
+#See the file COPYING for more details.
+
+# Everything the driver sends to or reads from the TT goes through a transport.
+# DllTransport talks to ttusbd.dll, LoopbackTransport keeps everything in memory so the driver can be run and measured without the hardware or Windows.
+
+import ctypes
+from collections import deque
+
+def _consume(iterator):
+	# runs the iterator to the end in C instead of a python for loop
+	deque(iterator, 0)
+
+class Transport(object):
+	# counted by every transport for _ttmetrics.py, writes are made with ttusb.deviceLock held so they don't need a lock of their own
+	bytesWritten = 0
+	immediateBytes = 0 # how many of them went through write_immediate
+
+	def write_bytes(self, data):
+		# writes data to the TT, every 0x1e has to go through write_immediate as the TT dll expects
+		raise NotImplementedError
+	def write_immediate(self, byte):
+		raise NotImplementedError
+	def read_index(self):
+		# the next index the TT has reached or -1 if there isn't one
+		raise NotImplementedError
+	def flush(self):
+		# Use WriteByte instead of WriteByteImmediate because the latter can interrupt during command processing causing partial commands to get spoken
+		self.write_bytes(b"\x18")
+
+class DllTransport(Transport):
+	def __init__(self, dll):
+		# Look the functions up once instead of on every byte.
+		# argtypes is left alone on purpose, ctypes already passes a python int as a C int and with argtypes set every call goes through from_param which nearly doubles the cost of a byte.
+		self._writeByte = dll.USBTT_WriteByte
+		self._writeByte.restype = ctypes.c_int
+		self._writeByteImmediate = dll.USBTT_WriteByteImmediate
+		self._writeByteImmediate.restype = ctypes.c_int
+		self._readByte = dll.USBTT_ReadByte
+		self._readByte.restype = ctypes.c_int
+	def write_bytes(self, data):
+		# don't use WriteString because it has performance issues, causes other strange behavior, and is just meant for quick testing
+		writeByte = self._writeByte
+		segments = data.split(b"\x1e")
+		self.bytesWritten += len(data)
+		self.immediateBytes += len(segments)-1
+		_consume(map(writeByte, segments[0]))
+		for segment in segments[1:]:
+			self._writeByteImmediate(0x1e)
+			_consume(map(writeByte, segment))
+	def write_immediate(self, byte):
+		self.bytesWritten += 1
+		self.immediateBytes += 1
+		self._writeByteImmediate(byte)
+	def read_index(self):
+		return self._readByte()
+
+class LoopbackTransport(Transport):
+	# Acts like a TT that finishes speaking the moment it gets a carriage return, every index in the text becomes readable right then.
+	# written keeps every byte sent and immediate the positions in written that went through write_immediate.
+	def __init__(self):
+		self.written = bytearray()
+		self.immediate = []
+		self.indexes = deque()
+		self._utterance = deque()
+		self._command = None
+	def write_bytes(self, data):
+		for element in data:
+			if element == 0x1e:
+				self.write_immediate(element)
+			else:
+				self.bytesWritten += 1
+				self.written.append(element)
+				self._parse(element)
+	def write_immediate(self, byte):
+		self.bytesWritten += 1
+		self.immediateBytes += 1
+		self.immediate.append(len(self.written))
+		self.written.append(byte)
+		self._parse(byte)
+	def read_index(self):
+		if self.indexes:
+			return self.indexes.popleft()
+		return -1
+	def _parse(self, element):
+		if element == 0x18: # flush throws away everything not spoken yet
+			self._utterance.clear()
+			self.indexes.clear()
+			self._command = None
+		elif element == 0x01:
+			self._command = ""
+		elif self._command is not None:
+			if 0x30 <= element <= 0x39:
+				self._command += chr(element)
+			else:
+				if element == ord("i") and self._command:
+					self._utterance.append(int(self._command))
+				self._command = None
+		elif element == 0x0d:
+			self.indexes.extend(self._utterance)
+			self._utterance.clear()
@@ -11,10 +11,11 @@ import threading
 import winAPI
 from winAPI import secureDesktop
 import api
+import globalVars
 import synthDriverHandler
 from synthDriverHandler import SynthDriver, synthDoneSpeaking, synthIndexReached 
 from speech.commands import IndexCommand, PitchCommand, CharacterModeCommand
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from logHandler import log
 import ctypes
 import _ctypes
@@ -24,21 +25,50 @@ import sys
 import time
 from autoSettingsUtils.driverSetting import DriverSetting
 from autoSettingsUtils.utils import StringParameterInfo
+from ._ttnormalizer import characterBytes, characterTable, toAscii
+from ._tttransport import DllTransport
+from ._ttindexes import IndexRing
+from ._ttcache import EncodedTextCache
+from ._ttdictionary import PronunciationDictionary, load as loadDictionary
+from ._ttmetrics import Metrics
+from ._tttrace import TraceRecorder
+from ._ttcapture import CaptureWriter, RecordingTransport
 kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
 kernel32.GetPrivateProfileIntW.argtypes = [wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.INT, wintypes.LPCWSTR]
 kernel32.WritePrivateProfileStringW.argtypes = [wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.LPCWSTR]
 USBTT = None
+transport = None # all reading and writing goes through this, see _tttransport.py
 exceptionLine = 0
 changedDesktop = False
 settingPauseMode = False
-lastSentIndex = 0
-lastReceivedIndex = -1
 stopIndexing = False
 indexReached = None
 indexesAvailable = None
-milliseconds = 100
-nvdaIndexes = [0] * 100
+indexWake = None # set by speak and cancel so the index thread stops sleeping on an estimate for speech that has been flushed or has more after it
+indexRing = IndexRing() # which NVDA index goes with each TT index that is out, see _ttindexes.py
+textCache = EncodedTextCache() # the bytes for strings NVDA says often
+capture = None # the CaptureWriter while SynthDriver.startCapture has one running, transport is a RecordingTransport then, see _ttcapture.py
+tracer = None # a TraceRecorder while SynthDriver.startTrace has one running, see _tttrace.py
+metrics = Metrics() # how long each part of an utterance takes, see _ttmetrics.py and SynthDriver.logMetrics
+dictionaryFile = "ttusb.dic" # the user's pronunciations, in the NVDA user config directory
+maxIndexWait = 2.0 # the longest speak waits for the TT to give back enough indexes for an utterance
+# During say all NVDA can put indexes only a word or two apart, each one is a command the TT has to process and a read for the index thread.
+# An index less than this many bytes of speech after the one before it in the same utterance takes that one's place instead of being sent as well,
+# the bytes are counted from where the first of the indexes that were merged would have gone so a run of close indexes can't merge into one for a whole line. 0 sends them all.
+# Set from the index merging setting, see SynthDriver.indexMerges.
+indexMergeBytes = 0
+doneSpeakingIndex = -1 # speak puts an index at the end of every utterance, when the TT reaches the last one onIndexReached gets this and sends synthDoneSpeaking
+speechCharsPerSecond = 22.0 # set by speak from the rate
+# rough speaking speed of the TT in characters a second at each rate, on the fast side so the index thread wakes up a little early rather than late
+rateCharsPerSecond = (12.0, 14.5, 17.0, 19.5, 22.0, 24.5, 27.0, 29.5, 32.0, 34.5)
+fastPoll = 0.01 # seconds between polls once an index is due
+slowPoll = 0.1 # the longest gap between polls once an index is overdue
+maxSleep = 0.5 # the longest the index thread sleeps on an estimate before checking again
 synthFlushed = True
+deviceLock = threading.Lock() # held around every write to the TT since speech is written from the writer thread and pause from the main thread
+maxPendingBytes = 16384 # how much speech can wait for the writer thread before speak has to wait for it
+writeChunkSize = 64 # the writer gives up deviceLock this often so pausing doesn't wait for a whole say all chunk to be written
+streamBytes = 4096 # a long sequence is handed to the writer, ending in a carriage return so the TT starts talking, every time this much text is ready
 
 def is_admin():
 	try:
@@ -48,19 +78,31 @@ def is_admin():
 
 def unload_dll():
 	global USBTT
-	global lastSentIndex
-	global lastReceivedIndex
-	global nvdaIndexes
+	global transport
 	if USBTT:
-		_ctypes.FreeLibrary(USBTT._handle)
-		USBTT = None
-		nvdaIndexes.clear()
-		lastSentIndex = 0
-		lastReceivedIndex = -1
+		with deviceLock:
+			transport = None
+			_ctypes.FreeLibrary(USBTT._handle)
+			USBTT = None
+		indexRing.clear()
+
+def loadPronunciations():
+	# A missing file is no pronunciations, one that can't be read is logged and the synth carries on without it.
+	path = os.path.join(globalVars.appArgs.configPath, dictionaryFile)
+	if not os.path.exists(path):
+		return PronunciationDictionary()
+	try:
+		dictionary, errors = loadDictionary(path)
+	except Exception:
+		log.error("TripleTalk couldn't load pronunciations from %s" % path, exc_info=True)
+		return PronunciationDictionary()
+	for error in errors:
+		log.warning(error)
+	return dictionary
 
 def load_dll(load):
-	global nvdaIndexes
 	global USBTT
+	global transport
 	global exceptionLine
 	if not USBTT:
 		path = os.getenv('windir', r"c:\windows")
@@ -82,7 +124,10 @@ def load_dll(load):
 					USBTT = None
 					frameinfo = getframeinfo(currentframe())
 					exceptionLine = frameinfo.lineno
-				nvdaIndexes = [0] * 100
+				if USBTT:
+					transport = DllTransport(USBTT)
+					if capture:
+						transport = RecordingTransport(transport, capture)
 				return True
 			else:
 				frameinfo = getframeinfo(currentframe())
@@ -113,26 +158,185 @@ def desktopChanged(isSecureDesktop):
 
 class IndexingThread(threading.Thread):
 	def __init__(self):
-		threading.Thread.__init__(self)
+		threading.Thread.__init__(self, name="TripleTalk indexes")
 		self.daemon = True
+		self.lastIndexTime = 0
+		self.polls = 0
+		self.emptyPolls = 0 # polls that found nothing from the TT
+		self.utteranceSent = 0 # when the utterance the last index came back for was sent, to tell when the first index of the next one comes back
 	def run(self):
-		global lastReceivedIndex
 		# The TT uses indexes 0-99 so we map the NVDA indexes to this and when we receive a TT index we send back the correct NVDA index
 #		log.warning("index thread %d" % threading.current_thread().ident) # uncomment this to get the indexing thread it in the nvda log for performance profiling
 		while not stopIndexing:
-			if lastSentIndex-1 == lastReceivedIndex or synthFlushed or not USBTT:
+			if not indexRing.outstanding or synthFlushed or not transport:
 				indexesAvailable.clear()
-				indexesAvailable.wait()
-			time.sleep(milliseconds/1000)
+				# speak may have added indexes and set the event between the check above and the clear, look again so that wake up isn't lost
+				if not indexRing.outstanding or synthFlushed or not transport:
+					start = time.perf_counter()
+					indexesAvailable.wait()
+					trace = tracer # stopTrace can set tracer to None at any time
+					if trace:
+						trace.span("idle", start)
+			start = time.perf_counter()
+			indexWake.clear() # before working out the delay so a speak or cancel while it is being worked out still cuts the sleep short
+			delay = self.pollDelay()
+			woken = indexWake.wait(delay)
+			trace = tracer
+			if trace:
+				trace.span("sleep", start, {"delay ms": delay*1000, "woken": woken})
+				start = time.perf_counter()
+			if woken: # what it was waiting for has changed, start again and work out a new delay
+				continue
 			if synthFlushed: # when the synth has been flushed there is no need to waste time looking for indexes
 				continue
-			if USBTT:
-				b = USBTT.USBTT_ReadByte()
+			device = transport
+			if not device:
+				continue
+			# read everything the TT has for us so we never fall behind when several indexes go by between polls,
+			# NVDA treats every index before the one it is told about as reached so only the last one needs to be sent
+			received = False
+			latest = None
+			done = False
+			self.polls += 1
+			b = device.read_index()
+			while b != -1:
+				sentTime = indexRing.sentTimes[b % indexRing.size] # read first since the slot can be used again once reached gives it up
+				reached = indexRing.reached(b)
+				if reached:
+					received = True
+					nvdaIndex, done = reached
+					if nvdaIndex is not None:
+						latest = nvdaIndex
+					if sentTime != self.utteranceSent:
+						self.utteranceSent = sentTime
+						metrics.record("first index", time.perf_counter()-sentTime)
+					if done:
+						metrics.record("done", time.perf_counter()-sentTime)
+				b = device.read_index()
+			if received:
+				self.lastIndexTime = time.perf_counter()
+				if latest is not None:
+					indexReached(latest)
+				# the TT only goes quiet at the end of the last utterance, the end of an earlier one just means it moved on to the next
+				if done and not indexRing.outstanding:
+					indexReached(doneSpeakingIndex)
 			else:
-				b = -1
-			if b != -1:
-				lastReceivedIndex = b
-				indexReached(nvdaIndexes[lastReceivedIndex])
+				self.emptyPolls += 1
+			if trace:
+				trace.span("poll", start, {"latest": latest, "done": done})
+				trace.counter("indexes", {"outstanding": indexRing.outstanding})
+	def pollDelay(self):
+		# Instead of polling at a fixed rate work out when the TT should get to the next index from how much text comes before it and how fast the TT is talking.
+		# Sleep until then and poll quickly around it, if it still hasn't come back slow down again so a slow voice or a paused TT doesn't keep us busy.
+		nextIndex = indexRing.oldest
+		start = max(self.lastIndexTime, indexRing.sentTimes[nextIndex]) # the TT was either still talking or started when the text was sent
+		due = start+indexRing.chars[nextIndex]/speechCharsPerSecond
+		now = time.perf_counter()
+		if due-now > fastPoll:
+			return min(due-now, maxSleep)
+		return min(slowPoll, fastPoll+(now-due)/4)
+
+class WriterThread(threading.Thread):
+	# The USB driver can take a while to accept a long say all chunk so the bytes are written from here and speak only has to hand them over.
+	# When more than maxPendingBytes are waiting write blocks until there is room so a runaway say all can't queue up without limit.
+	def __init__(self):
+		threading.Thread.__init__(self, name="TripleTalk writer")
+		self.daemon = True
+		self.pending = deque() # (bytes, when they were handed over)
+		self.pendingBytes = 0
+		self.stopWriting = False
+		self.condition = threading.Condition()
+		self.idle = threading.Event() # set whenever everything handed to write has been written
+		self.idle.set()
+		self.generation = 0 # goes up on every cancel so run knows to give up on what it is writing
+		self.current = b"" # what run is writing and how much of it has gone out, only touched with deviceLock held
+		self.written = 0
+	def write(self, text, block=True):
+		# block is False for the rest of a sequence speak has already started writing, making speak wait there would only hold up NVDA
+		# while the whole sequence is worked out anyway and it was only ever going to be queued in one go before.
+		# Returns True if text has been queued, the caller mustn't change it after that.
+		with self.condition:
+			if not self.pending and self.idle.is_set() and len(text) <= writeChunkSize:
+				# short things like typing echo go straight out when nothing else is being written, waking the writer thread would only add a thread switch
+				start = time.perf_counter()
+				with deviceLock:
+					if transport:
+						transport.write_bytes(text)
+				metrics.record("transmit", time.perf_counter()-start)
+				if tracer:
+					tracer.span("write", start, {"bytes": len(text)})
+				return False
+			while block and self.pending and self.pendingBytes+len(text) > maxPendingBytes and not self.stopWriting:
+				self.condition.wait()
+			self.pending.append((text, time.perf_counter()))
+			self.pendingBytes += len(text)
+			self.idle.clear()
+			self.condition.notify_all()
+			return True
+	def cancel(self):
+		# Throw away everything that hasn't been written yet and flush the TT straight away instead of queuing the flush behind it.
+		# Returns True if anything was thrown away, the parameters speak put at the start of it never got to the TT.
+		with self.condition:
+			dropped = bool(self.pending)
+			for text, handedOver in self.pending:
+				self.pendingBytes -= len(text)
+			self.pending.clear()
+			self.generation += 1
+			self.condition.notify_all()
+		with deviceLock:
+			current = self.current
+			end = self.written
+			if end < len(current):
+				dropped = True
+			if transport:
+				# if the last chunk ended part way through a command finish it so the TT doesn't take the flush as part of it,
+				# that includes a chunk ending on the 0x1e in front of a command
+				if end and current[end-1] == 0x1e and end < len(current) and current[end] == 0x01:
+					end += 1
+				start = current.rfind(b"\x01", 0, end)
+				if start != -1 and (start == end-1 or current[start+1:end].isdigit()):
+					while end < len(current) and 0x30 <= current[end] <= 0x39:
+						end += 1
+					end += 1
+				if end > self.written:
+					transport.write_bytes(current[self.written:end])
+				transport.flush()
+			self.current = b""
+			self.written = 0
+		return dropped
+	def stop(self):
+		with self.condition:
+			self.stopWriting = True
+			self.condition.notify_all()
+		self.join()
+	def run(self):
+		while True:
+			with self.condition:
+				while not self.pending and not self.stopWriting:
+					self.idle.set()
+					self.condition.wait()
+				if self.stopWriting:
+					self.idle.set()
+					return
+				text, handedOver = self.pending.popleft()
+				generation = self.generation
+			start = time.perf_counter()
+			for offset in range(0, len(text), writeChunkSize):
+				with deviceLock:
+					if generation != self.generation: # cancelled, the flush has already been written
+						break
+					self.current = text
+					self.written = min(offset+writeChunkSize, len(text))
+					if transport:
+						transport.write_bytes(text[offset:offset+writeChunkSize])
+			trace = tracer # stopTrace can set tracer to None at any time
+			if trace:
+				trace.span("write", start, {"bytes": len(text), "cancelled": generation != self.generation})
+			with self.condition:
+				if generation == self.generation:
+					metrics.record("transmit", time.perf_counter()-handedOver)
+				self.pendingBytes -= len(text)
+				self.condition.notify_all()
 
 class SynthDriver(synthDriverHandler.SynthDriver):
 	name="ttusb"
@@ -143,7 +347,8 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 		SynthDriver.InflectionSetting(10),
 		SynthDriver.VolumeSetting(10),
 		SynthDriver.VariantSetting(),
-		DriverSetting("pauseMode", _("&Pauses"), defaultVal="0")
+		DriverSetting("pauseMode", _("&Pauses"), defaultVal="0"),
+		DriverSetting("indexMerge", _("&Merge close indexes"), defaultVal="0")
 	)
 	supportedCommands = {
 		IndexCommand,
@@ -165,6 +370,13 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 		"1": StringParameterInfo("1", _("No Pauses")),
 		"2": StringParameterInfo("2", _("Shorten more than normal")),
 		"3": StringParameterInfo("3", _("Shorten maximum amount")) }
+	# how many bytes of speech an index has to be from the one before it to be sent, see indexMergeBytes.
+	# Fewer indexes means fewer commands for the TT and polls during say all but NVDA hears about where it has got to later, the cursor can lag behind the speech.
+	indexMerges={
+		"0": StringParameterInfo("0", _("Off")),
+		"16": StringParameterInfo("16", _("Within 16 characters")),
+		"32": StringParameterInfo("32", _("Within 32 characters")),
+		"64": StringParameterInfo("64", _("Within 64 characters")) }
 
 	@classmethod
 	def check(cls):
@@ -179,523 +391,293 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 		self.minVolume = 0
 		self.maxVolume = 9
 		self.tt_rate = 4
-		self.tt_rateChanged = False
 		self.nvda_rate = 40
 		self.tt_pitch=50
-		self.tt_pitchChanged = False
 		self.tt_inflection=5
-		self.tt_inflectionChanged = False
 		self.nvda_inflection = 50
 		self.tt_volume = 5
-		self.tt_volumeChanged = False
 		self.nvda_volume = 50
 		self.tt_variant = "0"
-		self.tt_variantChanged = False
+		self.tt_variantChanged = False # the TT has to be sent all the parameters again, its variant has changed or something else could have been changing them
+		self.deviceParams = {} # what the TT has been told each parameter is, by the letter of its command
+		self.paramsSent = set() # the letters of the parameters written since the last cancel
 		self.pauseModeOn = False
-		if not api.getForegroundObject() == None:
-			self.lastForegroundProcessID = api.getForegroundObject().processID
+		self.lastForegroundObject = api.getForegroundObject()
+		if self.lastForegroundObject is not None:
+			self.lastForegroundProcessID = self.lastForegroundObject.processID
 		else:
 			self.lastForegroundProcessID =0 
 		self.previousMetric = False
+		self._output = bytearray() # speak builds each utterance in this, see speak
+		textCache.setDictionary(loadPronunciations()) # read again each time the synth is chosen so edits take effect without restarting NVDA
 		self.tt_pauseMode = kernel32.GetPrivateProfileIntW("ttalk_usb_comm", "nopauses", 0, "ttusbd.ini")
 		load_dll(True)
-		if USBTT:
-			init_string = b"\x18\x1e\x017b\r"
-			for element in init_string:
-				if element == 0x1e:
-					USBTT.USBTT_WriteByteImmediate(element)
-				else:
-					USBTT.USBTT_WriteByte(element)
+		if transport:
+			transport.write_bytes(b"\x18\x1e\x017b\r")
 		else:
 			sys.tracebacklimit = 0
 			raise RuntimeError("No TripleTalk drivers available problem line %d" % exceptionLine)
 		global stopIndexing
 		global indexesAvailable
-		global lastSentIndex
-		global lastReceivedIndex
+		global indexWake
 		global indexReached
 		stopIndexing = False
-		lastSentIndex = 0
-		lastReceivedIndex = -1
+		indexRing.clear()
+		metrics.reset()
 		indexesAvailable = threading.Event()
 		indexesAvailable.clear()
+		indexWake = threading.Event()
 		indexReached = self.onIndexReached
 		self.indexingThread = IndexingThread()
 		self.indexingThread.start()
+		self.writerThread = WriterThread()
+		self.writerThread.start()
 		winAPI.secureDesktop.post_secureDesktopStateChange.register(desktopChanged)
 		super(synthDriverHandler.SynthDriver,self).__init__()
 
 	def speak(self, speechSequence):
 		if self.pauseModeOn:
 			self.pause(False) # the TripleTalk needs to be told to resume it doesn't do it upon receiving new speech and NVDA doesn't send a pause False command before sending new speech
-		if not USBTT:
+		if not transport:
 			return
-		global milliseconds
-		global changedDesktop
-		text = ""
+		global speechCharsPerSecond
+		# wait for the TT to give back enough indexes for this utterance and the one that marks its end, only worth counting them when the ring is nearly full
+		if len(speechSequence) >= indexRing.size-indexRing.outstanding:
+			indexRing.reserve(sum(isinstance(item, IndexCommand) for item in speechSequence)+1, maxIndexWait)
+		sentTime = time.perf_counter()
+		speechCharsPerSecond = rateCharsPerSecond[self.tt_rate]
+		params = self._paramsCommand() # first since the pitch changes in the sequence have to be checked against the pitch it sets
+		metrics.record("params", time.perf_counter()-sentTime)
+		normalizeTime = textCache.normalizeTime
+		encodeTime = textCache.encodeTime
+		text = self._characterText(speechSequence, sentTime)
+		if text is None:
+			# Rather than building the whole sequence before writing any of it, each time streamBytes of text is ready
+			# it goes to the TT so the TT can start talking while the rest of a long say all chunk is still being worked out.
+			# It is only ever split between strings so the normalizer sees every string whole.
+			# Everything goes straight into one bytearray instead of building up a string, encoding it and then adding the parameters and carriage return,
+			# which copied a long say all chunk four or five times. The bytearray is kept for the next utterance unless the writer thread has to hold on to it.
+			out = self._output
+			out += params
+			segmentStart = len(out)
+			streamed = False
+			characterMode = False
+			spokenChars = 0
+			lastIndex = -1 # where in out the last index command is, -1 if there isn't one to move
+			lastCommand = b""
+			mergedChars = 0 # how far the last index command has been moved
+			lastPitch = -1 # where in out the last pitch command is if nothing has come after it
+			lastPitchCommand = b""
+			pitchBefore = None
+			for item in speechSequence:
+				if isinstance(item, CharacterModeCommand):
+					characterMode = item.state
+				elif isinstance(item, str):
+					# the normalizer and encoding only run for strings that haven't been said lately, see _ttcache.py
+					encoded, chars, self.previousMetric = textCache.encode(item, characterMode, self.previousMetric)
+					out += encoded
+					spokenChars += chars
+					lastPitch = -1
+					if len(out)-segmentStart >= streamBytes:
+						out += b"\r"
+						out = self._write(out, not streamed)
+						streamed = True
+						segmentStart = 0
+						lastIndex = -1 # it has been written so it can't be moved any more
+						lastPitch = -1
+				elif isinstance(item, IndexCommand):
+					if lastIndex != -1 and mergedChars+spokenChars < indexMergeBytes:
+						# NVDA takes reaching an index to mean it has reached all the ones before it so the last index can just move here,
+						# only the few bytes after it have to shift
+						indexRing.merge(item.index, spokenChars)
+						del out[lastIndex:lastIndex+len(lastCommand)]
+						mergedChars += spokenChars
+					else:
+						lastCommand = self._indexCommand(item.index, spokenChars, sentTime)
+						mergedChars = 0
+					lastIndex = len(out) if lastCommand else -1
+					out += lastCommand
+					spokenChars = 0
+					lastPitch = -1
+				elif isinstance(item, PitchCommand):
+					if lastPitch != -1:
+						# nothing to say at the pitch before this one so it doesn't need sending
+						del out[lastPitch:]
+						self.deviceParams[b"p"] = pitchBefore
+					else:
+						pitchBefore = self.deviceParams.get(b"p")
+					lastPitch = len(out)
+					out += self._pitchCommand(item)
+			if lastIndex != -1 and mergedChars+spokenChars < indexMergeBytes:
+				indexRing.merge(None, spokenChars, True)
+				del out[lastIndex:lastIndex+len(lastCommand)]
+				out += lastCommand
+			else:
+				out += self._doneSpeakingCommand(spokenChars, sentTime)
+			out += b"\r"
+			self._write(out, not streamed)
+		else:
+			self._write(b"%s%s\r" % (params, text))
+		if textCache.normalizeTime != normalizeTime:
+			metrics.record("normalize", textCache.normalizeTime-normalizeTime)
+			metrics.record("encode", textCache.encodeTime-encodeTime)
+		metrics.record("speak", time.perf_counter()-sentTime)
+		if tracer:
+			tracer.span("speak", sentTime, {"items": len(speechSequence)})
+
+	def _write(self, text, block=True):
+		# Returns the bytearray to carry on building the utterance in, a new one if the writer thread kept text.
+		global synthFlushed
+		kept = self.writerThread.write(text, block)
+		synthFlushed = False
+		indexesAvailable.set()
+		indexWake.set()
+		if tracer:
+			tracer.counter("state", {"synthFlushed": 0, "outstanding": indexRing.outstanding})
+		if kept and text is self._output:
+			self._output = bytearray()
+		elif text is self._output:
+			del text[:]
+		return self._output
+
+	def _characterText(self, speechSequence, sentTime):
+		# Typing echo and moving by character send a character or two in character mode, maybe with a pitch change for capitals and an index.
+		# When every string in the sequence is a single character in character mode use the precomputed bytes for it and skip the normalizer and encoding.
+		# Returns None for anything else so speak takes the normal path.
+		# Indexes are only given TT indexes and pitch changes only checked against the TT's pitch once the sequence is known to go this way,
+		# otherwise speak would do them a second time.
+		parts = []
 		characterMode = False
+		hasCharacters = False
+		spokenChars = 0
 		for item in speechSequence:
 			if isinstance(item, CharacterModeCommand):
 				characterMode = item.state
 			elif isinstance(item, str):
-				item_list = []
-				itemIndex = 0
-				itemLen = len(item)
-				if self.previousMetric:
-					# the previous string ended with a number so put a space at the beginning of this one as not to run numbers together	
-					# We have to do it this way instead of just adding a space at the end of the previous string while processing it
-					# because programs like excel can send something like "28  " "l 16  " in two separate strings
-					# and our metric processing would turn it into "28" "l 16" blocking the metric processing, but if the next string
-					# starts with a number we have to prefix it with a space
-					# if we do it while processing the previous string we'll get "28 " "l 16 " which won't block the metric processing
-					self.previousMetric = False
-					if itemLen and not characterMode and item[0].isnumeric():
-						if not item_list: item_list = list(item)
-						metricString = " "
-						metricString += item[0]
-						item_list[0] = metricString
-				for elementIndex, element in enumerate(item):
-					# Block everything below 32.  The TT dll does some of this, but it can't block the control char 0x01, flush 0x18, etc and allowing these in the text would cause problems with the synth.
-					if ord(element) < 32:
-						if not item_list: item_list = list(item)
-						item_list[elementIndex] = " "
-					elif not characterMode:
-						#fix so that the synthesizer says time correctly and also make it report leading zeros for numbers.
-						# remove the comma character only when it is in a number so the synthesizer says numbers correctly
-						# this only seems to matter if you set nopauses=1 in ttusbd.ini in the windows directory
-						# fix issues the synth has pronouncing money
-						# stop the synth from saying metric stuff like liters, grams, etc
-						# fix date stuff like 1st, 2nd, 3rd, 4th, etc
-						# fix words that NVDA splits that it shouldn't like McDonalds
-						if elementIndex < itemIndex: # skip the indexes we already processed for point, comma, leading zeros, money, metric stuff, or date stuff the previous time through the loop
-							continue
-						itemIndex = 0
-						if (((element == 'n' or element == 'N' or element == 'r' or element == 'R') and elementIndex+1 in range(itemLen) and (item[elementIndex+1] == 'd' or item[elementIndex+1] == 'D')) or
-						((element == 's' or element == 'S') and elementIndex+1 in range(itemLen) and (item[elementIndex+1] == 't' or item[elementIndex+1] == 'T')) or
-						((element == 't' or element == 'T') and elementIndex+1 in range(itemLen) and (item[elementIndex+1] == 'h' or item[elementIndex+1] == 'H'))):
-							# prevent the synth from doing date stuff like 21st being twenty first instead of 21 st etc.
-							tempIndex = elementIndex-1
-							while tempIndex >= 0:
-								if not item[tempIndex] == ' ':
-									break
-								tempIndex-=1
-							if tempIndex>= 0 and item[tempIndex].isnumeric():
-								if not item_list: item_list = list(item)
-								tempString = item[tempIndex]
-								tempString += ","
-								item_list[tempIndex] = tempString
-								itemIndex = elementIndex+2 # skip the chars we just processed
-						elif element == '.': # make it pronounce decimals correctly
-							if elementIndex == 0 or (elementIndex > 0 and (item[elementIndex-1].isnumeric() or
-							item[elementIndex-1] == ' ')) and elementIndex+1 in range(itemLen) and item[elementIndex+1].isnumeric:
-								if not item_list: item_list = list(item)
-								item_list[elementIndex] = " point "
-								itemIndex = elementIndex+1
-								while itemIndex in range(itemLen) and item[itemIndex] == '0':
-									item_list[itemIndex] = "o "
-									itemIndex+=1
-						elif element == ',':
-							if elementIndex > 0 and item[elementIndex-1].isnumeric():
-								commaIndex = elementIndex
-								itemIndex = elementIndex
-								numDigits = 0
-								while itemIndex in range(itemLen):
-									if not item[itemIndex].isnumeric() and not item[itemIndex] == ',':
-										break
-									if item[itemIndex].isnumeric():
-										numDigits +=1
-									elif item[itemIndex] == ',':
-										if not item_list: item_list = list(item)
-										if numDigits == 3 or (numDigits == 0 and itemIndex+1 in range(itemLen) and item[itemIndex+1].isalpha()):
-										# the second half of this if is for metric processing
-											item_list[commaIndex] = ""
-										elif numDigits > 0:
-											item_list[commaIndex] = " "
-										numDigits = 0
-										commaIndex = itemIndex
-									itemIndex+=1
-								if numDigits:
-									if not item_list: item_list = list(item)
-									if numDigits == 3 or (numDigits == 0 and itemIndex+1 in range(itemLen) and item[itemIndex+1].isalpha()):
-									# the second half of this if is for metric processing
-										item_list[commaIndex] = ""
-									elif numDigits > 0:
-										item_list[commaIndex] = " "
-						elif element == ' ': # stop the synth from saying metric items like liter, gram, etc and fix words like McDonalds
-							# NVDA splitting words of mixed case is bad for things like McDonalds so prevent it
-							if elementIndex >= 2 and item[elementIndex-1] == 'c' and item[elementIndex-2] == 'M':
-								if not item_list: item_list = list(item)
-								item_list[elementIndex] = ""
-							elif (elementIndex > 1 and item[elementIndex-2].isnumeric() and elementIndex+1 in range(itemLen) and item[elementIndex+1].isalpha() and
-							(item[elementIndex-1] == ':' or item[elementIndex-1] == ',')):
-								if not item_list: item_list = list(item)
-								item_list[elementIndex-1] = ""
-								item_list[elementIndex] = ""
-							elif elementIndex > 0 and item[elementIndex-1].isnumeric():
-								itemIndex = elementIndex
-								while itemIndex in range(itemLen):
-									if not item[itemIndex] == ' ':
-										break
-									if not item_list: item_list = list(item)
-									item_list[itemIndex] = ""
-									itemIndex+=1
-								if not itemIndex in range(itemLen): # set previousMetric since we are at the end of this string so we can handle it at the beginning of the next string
-									self.previousMetric = True
-								if itemIndex in range(itemLen) and item[itemIndex].isnumeric(): # don't run numbers previously separated by spaces together
-									if not item_list: item_list = list(item)
-									item_list[itemIndex-1] = " "
-						elif element == '$':
-							pointNotFound = True
-							if elementIndex > 0 and not item[elementIndex-1] == ' ':
-								if not item_list: item_list = list(item)
-								item_list[elementIndex] = " $"
-							itemIndex = elementIndex+1
-							while itemIndex in range(itemLen):
-								if not item[itemIndex].isnumeric() and item[itemIndex] != '.' and item[itemIndex] != ',':
-									break
-								elif item[itemIndex] == ',' and itemIndex+1 in range(itemLen) and item[itemIndex+1].isnumeric:
-									if not item_list: item_list = list(item)
-									item_list[itemIndex] = ""
-								elif item[itemIndex] == '.':
-									pointNotFound = False
-									if itemIndex+3 in range(itemLen) and item[itemIndex+1].isnumeric() and item[itemIndex+2].isnumeric() and item[itemIndex+3].isnumeric():
-										tempIndex = itemIndex+1
-										isLeadingZero = True
-										moneyString = " and "
-										while tempIndex in range(itemLen) and item[tempIndex].isnumeric():
-											if not item_list: item_list = list(item)
-											item_list[tempIndex] = ""
-											if item[tempIndex] == '0' and isLeadingZero:
-												moneyString += "zero "
-											else:
-												isLeadingZero = False
-											if item[tempIndex] > '0':
-												moneyString += item[tempIndex]
-											tempIndex+=1
-										moneyString += " cents "
-										if not item_list: item_list = list(item)
-										item_list[tempIndex-1] = moneyString
-										itemIndex = tempIndex-1
-									elif itemIndex+2 in range(itemLen) and item[itemIndex+1] == '0' and (item[itemIndex+2] == '0' or not item[itemIndex+2].isnumeric()):
-										if not item_list: item_list = list(item)
-										item_list[itemIndex+1] = ""
-										item_list[itemIndex+2] = ""
-									elif itemIndex+2 in range(itemLen) and item[itemIndex+1].isnumeric() and item[itemIndex+1] > '0' and not item[itemIndex+2].isnumeric():
-										if not item_list: item_list = list(item)
-										moneyString = " and "
-										moneyString += item_list[itemIndex+1]
-										moneyString += "0 cents "
-										item_list[itemIndex+1] = moneyString
-									elif itemIndex+2 in range(itemLen) and item[itemIndex+1] == '0' and item[itemIndex+2] == '1':
-										if not item_list: item_list = list(item)
-										item_list[itemIndex+1] = "and 1 cent"
-										item_list[itemIndex+2] = ""
-									elif itemIndex+2 in range(itemLen) and item[itemIndex+1].isnumeric() and item[itemIndex+2].isnumeric():
-										if item[itemIndex+1] == '0':
-											moneyString = " and "
-											moneyString += item[itemIndex+2]
-											moneyString += " cents "
-										elif item[itemIndex+1] >= '1':
-											moneyString = " and "
-											moneyString += item[itemIndex+1]
-											moneyString += item[itemIndex+2]
-											moneyString += " cents "
-										if not item_list: item_list = list(item)
-										item_list[itemIndex+1] = moneyString
-										item_list[itemIndex+2] = ""
-								itemIndex+=1
-							if pointNotFound:
-								if itemIndex+1 in range(itemLen) and item[itemIndex] == ' ' and item[itemIndex+1].isalpha():
-									skipString = "bBmM"
-									if item[itemIndex+1] not in skipString:
-										if not item_list: item_list = list(item)
-										moneyString = ". "
-										item_list[itemIndex] = moneyString
-										itemIndex+=2
-									elif (item[itemIndex+1] == 'b' or item[itemIndex+1] == 'B') and itemIndex+2 in range(itemLen) and (item[itemIndex+2] == 'y' or item[itemIndex+2] == 'Y'):
-										if not item_list: item_list = list(item)
-										moneyString = ". "
-										item_list[itemIndex] = moneyString
-										itemIndex+=3
-								elif itemIndex in range(itemLen) and item[itemIndex].isalpha():
-									skipString = "bBmM"
-									if item[itemIndex] not in skipString:
-										if not item_list: item_list = list(item)
-										moneyString = "."
-										moneyString += item[itemIndex]
-										item_list[itemIndex] = moneyString
-										itemIndex+=1
-									elif (item[itemIndex] == 'b' or item[itemIndex] == 'B') and itemIndex+1 in range(itemLen) and (item[itemIndex+1] == 'y' or item[itemIndex+1] == 'Y'):
-										if not item_list: item_list = list(item)
-										moneyString = "."
-										moneyString += item[itemIndex]
-										item_list[itemIndex] = moneyString
-										itemIndex+=2
-						elif element == ':':
-							if elementIndex > 0 and item[elementIndex-1].isnumeric() and elementIndex+1 in range(itemLen) and item[elementIndex+1].isalpha(): # this is for metric processing
-								if not item_list: item_list = list(item)
-								item_list[elementIndex] = ""
-							else:
-								allowOClock = True
-								hasSeconds = False
-								if elementIndex >= 3 and item[elementIndex-3] == ':':
-									hasSeconds = True
-								if elementIndex >= 2 and item[elementIndex-1] == '0' and item[elementIndex-2] == '0':
-									if not hasSeconds:
-										if not item_list: item_list = list(item)
-										item_list[elementIndex	-2] = ""
-								if elementIndex == 0 or item[elementIndex-1] == '0':
-									allowOClock = False
-								if elementIndex >= 2 and item[elementIndex-2] == '1': #for 10 o clock
-									allowOClock = True
-							if element == ':' and elementIndex+2 in range(itemLen) and item[elementIndex+1] == '0':
-								if not item_list: item_list = list(item)
-								if allowOClock and not hasSeconds:
-									if item[elementIndex+2].isnumeric():
-										item_list[elementIndex+1] = "o "
-								else:
-									item_list[elementIndex+1] = "zero "
-								if item[elementIndex+2] == '0':
-									if not item_list: item_list = list(item)
-									if allowOClock and not hasSeconds:
-										item_list[elementIndex+2] = "clock "
-									else:
-										item_list[elementIndex+2] = "zero "
-						elif element == '0':
-							if elementIndex == 0 or (elementIndex > 0 and item[elementIndex-1] == ' ' and elementIndex+1 in range(itemLen) and not item[elementIndex+1] == ' '):
-								tempIndex = elementIndex
-								while tempIndex in range(itemLen):
-									if item[tempIndex] == ':':
-										tempIndex = 0
-										break
-									elif item[tempIndex] != '0':
-										break
-									tempIndex +=1
-								if tempIndex and tempIndex+1 in range(itemLen) and item[tempIndex+1] != ':': # the part after testing tempIndex prevents leading zeros on time
-									itemIndex = tempIndex
-									tempIndex -=1
-									if not item_list: item_list = list(item)
-									while tempIndex >= elementIndex:
-										item_list[tempIndex] = "zero "
-										tempIndex -=1
-				if item_list:
-					item = "".join(item_list)
-				upperAscii = {
-					128:"euro",
-					129:"",
-				130:"single low-9 quote",
-				131:"f hook",
-					132:"double low-9 quote",
-					133:"horizontal ellipsis",
-					134:"dagger",
-					135:"double dagger",
-					136:"circumflex accent",
-					137:"per mille",
-					138:"S caron",
-					139:"single left-pointing angle quote",
-					140:"ligature OE",
-					141:"",
-					142:"Z caron",
-					143:"",
-					144:"",
-					145:"left single quote",
-					146:"right single quote",
-					147:"left double quote",
-					148:"right double quote",
-					149:"bullet",
-					150:"en dash",
-					151:"em dash",
-					152:"tilde",
-					153:"trade mark",
-					154:"S caron",
-					155:"single right-pointing angle quote",
-					156:"ligature oe",
-					157:"",
-					158:"z caron",
-					159:"Y diaeresis",
-					160:"non-breaking space",
-					161:"inverted exclamation mark",
-					162:"cents",
-					163:"pound",
-					164:"currency",
-					165:"yen",
-					166:"pipe broken vertical bar",
-					167:"section",
-					168:"spacing diaeresis – umlaut",
-					169:"copyright",
-					170:"feminine ordinal",
-					171:"left double-angle quotes",
-					172:"egation",
-					173:"soft hyphen",
-					174:"registered trademark",
-					175:"spacing macron – overline",
-					176:"degree",
-					177:"plus-or-minus",
-					178:"superscript two",
-					179:"superscript three",
-					180:"acute accent",
-					181:"micro",
-					182:"pilcrow",
-					183:"middle dot",
-					184:"spacing cedilla",
-					185:"superscript one",
-					186:"masculine ordinal",
-					187:"right double-angle quotes",
-					188:"one quarter",
-					189:"one half",
-					190:"three quarters",
-					191:"inverted question mark",
-					192:"A grave",
-					193:"A acute",
-					194:"A circumflex",
-					195:"A tilde",
-					196:"A diaeresis",
-					197:"A ring above",
-					198:"A E",
-					199:"C cedilla",
-					200:"E grave",
-					201:"E acute",
-					202:"E circumflex",
-					203:"E diaeresis",
-					204:"I grave",
-					205:"I acute",
-					206:"I circumflex",
-					207:"I diaeresis",
-					208:"ETH",
-					209:"N tilde",
-					210:"O grave",
-					211:"O acute",
-					212:"O circumflex",
-					213:"O tilde",
-					214:"O diaeresis",
-					215:"times",
-					216:"O a slash",
-					217:"U grave",
-					218:"U acute",
-					219:"U circumflex",
-					220:"U diaeresis",
-					221:"Y acute",
-					222:"THORN",
-					223:"sharp s",
-					224:"a grave",
-					225:"a acute",
-					226:"a circumflex",
-					227:"a tilde",
-					228:"a diaeresis",
-					229:"a ring above",
-					230:"a e",
-					231:"c cedilla",
-					232:"e grave",
-					233:"e acute",
-					234:"e circumflex",
-					235:"e diaeresis",
-					236:"i grave",
-					237:"i acute",
-					238:"i circumflex",
-					239:"i diaeresis",
-					240:"eth",
-					241:"n tilde",
-					242:"o grave",
-					243:"o acute",
-					244:"o circumflex",
-					245:"o tilde",
-					246:"o dia,eresis",
-					247:"divided",
-					248:"o slash",
-					249:"u grave",
-					250:"u acute",
-					251:"u circumflex",
-					252:"u diaeresis",
-					253:"y acute",
-					254:"thorn,",
-					255:"y diaeresis" }
-				if characterMode and itemLen == 1 and ord(item) in upperAscii:
-					item = upperAscii[ord(item)]
-				text += item
+				if not characterMode or len(item) != 1:
+					return None
+				character = characterBytes.get(item)
+				if character is None:
+					character = toAscii(item.translate(characterTable)).encode('ascii')
+				parts.append(character)
+				spokenChars += len(character)
+				hasCharacters = True
 			elif isinstance(item, IndexCommand):
-				global lastSentIndex
-				global nvdaIndexes
-				text += "\x1e\x01%di" % lastSentIndex
-				nvdaIndexes[lastSentIndex] = item.index
-				lastSentIndex += 1
-				if lastSentIndex == 100:
-					lastSentIndex = 0
+				parts.append((item.index, spokenChars))
+				spokenChars = 0
 			elif isinstance(item, PitchCommand):
-				offsetPitch = self.tt_pitch + item.offset
-				if offsetPitch > self.maxPitch:
-					offsetPitch = self.maxPitch
-				text += "\x1e\x01%dp" % offsetPitch
+				if parts and isinstance(parts[-1], PitchCommand):
+					parts[-1] = item # nothing to say at the pitch before this one
+				else:
+					parts.append(item)
+		if not hasCharacters:
+			return None
+		self.previousMetric = False
+		text = b"".join(part if isinstance(part, bytes) else self._pitchCommand(part) if isinstance(part, PitchCommand) else self._indexCommand(part[0], part[1], sentTime)
+			for part in parts)
+		return text+self._doneSpeakingCommand(spokenChars, sentTime)
+
+	def _indexCommand(self, index, spokenChars, sentTime):
+		# The TT uses indexes 0-99 so remember which NVDA index goes with the TT index we send
+		# and how much speech comes before it so the index thread knows when to look for it
+		ttIndex = indexRing.add(index, spokenChars, sentTime)
+		if ttIndex == -1: # no room left, the next index sent covers this one
+			return b""
+		return b"\x1e\x01%di" % ttIndex
+
+	def _doneSpeakingCommand(self, spokenChars, sentTime):
+		ttIndex = indexRing.addDoneSpeaking(spokenChars, sentTime)
+		if ttIndex == -1:
+			return b""
+		return b"\x1e\x01%di" % ttIndex
 
-		text = text.encode('ascii', 'replace')
-		textLength = len(text)
+	def _pitchCommand(self, item):
+		offsetPitch = self.tt_pitch + item.offset
+		if offsetPitch > self.maxPitch:
+			offsetPitch = self.maxPitch
+		if self.deviceParams.get(b"p") == offsetPitch:
+			return b""
+		self.deviceParams[b"p"] = offsetPitch
+		self.paramsSent.add(b"p")
+		return b"\x1e\x01%dp" % offsetPitch
+
+	def _paramsCommand(self):
+		global changedDesktop
 		# only resend the speech parameters when the foreground window changes or when the desktop changes.
 		# This accounts for self talking apps that might change the speech parameters and the version of NVDA running on the secure desktop doing the same
 		# force this by lying and saying that the variant of the voice has changed because when it changes all parameters have to be resent
-		if not api.getForegroundObject() == None:
-			if self.lastForegroundProcessID != api.getForegroundObject().processID:
-				self.tt_variantChanged = True
-				self.lastForegroundProcessID = api.getForegroundObject().processID
+		# api.getForegroundObject only hands back what NVDA already has, asking the object for its processID is what can go out to another process
+		# so only do that when NVDA has a different foreground object, the process an object belongs to never changes
+		foregroundObject = api.getForegroundObject()
+		if foregroundObject is not self.lastForegroundObject:
+			self.lastForegroundObject = foregroundObject
+			if foregroundObject is not None:
+				processID = foregroundObject.processID
+				if self.lastForegroundProcessID != processID:
+					self.tt_variantChanged = True
+					self.lastForegroundProcessID = processID
 		if changedDesktop:
 			self.tt_variantChanged = True
 			changedDesktop = False
-		params = b""
+		# only send the parameters the TT doesn't already have, a change of variant resets the others so they all go again after one
+		device = self.deviceParams
 		if self.tt_variantChanged:
-			params = ("\x1e\x01%so\x01%ds\x01%dp\x01%de\x01%dv" % (self.tt_variant, self.tt_rate, self.tt_pitch, self.tt_inflection, self.tt_volume)).encode('ascii', 'replace')
+			device.clear()
 			self.tt_variantChanged = False
-			self.tt_rateChanged = False
-			self.tt_pitchChanged = False
-			self.tt_volumeChanged = False
-			self.tt_inflectionChanged = False
-		if self.tt_rateChanged:
-			params += ("\x1e\x01%ds" % self.tt_rate).encode('ascii', 'replace')
-			self.tt_rateChanged = False
-		if self.tt_pitchChanged:
-			params += ("\x1e\x01%dp" % self.tt_pitch).encode('ascii', 'replace')
-			self.tt_pitchChanged = False
-		if self.tt_volumeChanged:
-			params += ("\x1e\x01%dv" % self.tt_volume).encode('ascii', 'replace')
-			self.tt_volumeChanged = False
-		if self.tt_inflectionChanged:
-			params += ("\x1e\x01%de" % self.tt_inflection).encode('ascii', 'replace')
-			self.tt_inflectionChanged = False
-		text = b"%s%s%s" % (params, text, b"\r")
-		if characterMode or textLength < 10:
-			milliseconds = 10 # for short strings use 10 milliseconds to keep things responsive
-		else:
-			milliseconds = 100 # for long strings use 100 milliseconds as to not hammer the synth for index marks and waste CPU
-		# don't use WriteString because it has performance issues, causes other strange behavior, and is just meant for quick testing
-		for element in text:
-			if element == 0x1e:
-				USBTT.USBTT_WriteByteImmediate(element)
-			else:
-				USBTT.USBTT_WriteByte(element)
-		global synthFlushed
-		synthFlushed = False
-		indexesAvailable.set()
+		commands = b""
+		# the variant is a string, the rest are numbers and the pitch comes from round so it can be a float, %d sends 60 rather than 60.0
+		for letter, value in ((b"o", self.tt_variant.encode('ascii', 'replace')), (b"s", self.tt_rate), (b"p", self.tt_pitch), (b"e", self.tt_inflection), (b"v", self.tt_volume)):
+			if device.get(letter) != value:
+				device[letter] = value
+				self.paramsSent.add(letter)
+				commands += (b"\x01%s%s" if letter == b"o" else b"\x01%d%s") % (value, letter)
+		if commands:
+			return b"\x1e"+commands
+		return commands
 
 	def cancel(self):
 		global synthFlushed
-		if synthFlushed or not USBTT:
+		if synthFlushed or not transport:
 			return
 		synthFlushed = True
-		USBTT.USBTT_WriteByte(0x18) # Use WriteByte instead of WriteByteImmediate because the latter can interrupt during command processing causing partial commands to get spoken
+		start = time.perf_counter()
+		unfinished = indexRing.outstanding
+		indexRing.clear()
+		dropped = self.writerThread.cancel() # the flush uses WriteByte instead of WriteByteImmediate because the latter can interrupt during command processing causing partial commands to get spoken
+		if self.paramsSent and (dropped or unfinished):
+			# parameters that were thrown away before being written or flushed before the TT got to them never happened,
+			# so what the TT is set to for those isn't known any more and speak has to send them again, all of them if the variant was one since it resets the rest
+			if b"o" in self.paramsSent:
+				self.deviceParams.clear()
+			else:
+				for letter in self.paramsSent:
+					self.deviceParams.pop(letter, None)
+		self.paramsSent.clear()
+		indexWake.set()
+		if tracer:
+			tracer.span("cancel", start)
+			tracer.counter("state", {"synthFlushed": 1, "outstanding": 0})
 
 	def terminate(self):
 		global indexReached
 		global stopIndexing
 		global synthFlushed
+		if not self.writerThread == None:
+			self.writerThread.stop()
+		self.stopCapture()
 		unload_dll()
 		indexReached = None
 		stopIndexing = True
 		synthFlushed = False
 		if not indexesAvailable == None:
 			indexesAvailable.set()
+		if not indexWake == None:
+			indexWake.set()
 		if not self.indexingThread == None:
 			self.indexingThread.join()
 
 	def _set_rate(self, rate):
 		if rate != self.nvda_rate:
-			self.tt_rateChanged = True
 			self.tt_rate = round(rate/10)
 			self.nvda_rate = rate
 			if self.tt_rate > self.maxRate:
@@ -706,7 +688,6 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 
 	def _set_pitch(self, pitch):
 		if pitch != self.tt_pitch:
-			self.tt_pitchChanged = True
 			val = round(self._percentToParam(pitch, self.minPitch, self.maxPitch), -1)
 			if val > self.maxPitch:
 				val = self.maxPitch
@@ -717,7 +698,6 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 
 	def _set_inflection(self, inflection):
 		if inflection != self.nvda_inflection:
-			self.tt_inflectionChanged = True
 			self.tt_inflection = round(inflection/10)
 			self.nvda_inflection = inflection
 			if self.tt_inflection > self.maxInflection:
@@ -728,7 +708,6 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 
 	def _set_volume(self, volume):
 		if volume != self.nvda_volume:
-			self.tt_volumeChanged = True
 			self.tt_volume = round(volume/10)
 			self.nvda_volume = volume
 			if self.tt_volume > self.maxVolume:
@@ -748,6 +727,71 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 	def _get_variant(self):
 		return self.tt_variant
 
+	def getMetrics(self):
+		# Everything _ttmetrics.py keeps with the counters from the rest of the driver, for tests and the python console.
+		counters = {}
+		if transport:
+			counters["bytes written"] = transport.bytesWritten
+			counters["immediate bytes"] = transport.immediateBytes
+		counters["polls"] = self.indexingThread.polls
+		counters["empty polls"] = self.indexingThread.emptyPolls
+		for name, value in indexRing.counters().items():
+			counters["indexes " + name] = value
+		for name, value in textCache.counters().items():
+			counters["cache " + name] = value
+		return metrics.snapshot(counters)
+
+	def logMetrics(self):
+		# From the NVDA python console: import synthDriverHandler; synthDriverHandler.getSynth().logMetrics()
+		log.info("TripleTalk metrics\n" + metrics.report(self.getMetrics()["counters"]))
+
+	def startTrace(self, size=100000):
+		# Starts recording a timeline of the last size events, from the NVDA python console: synthDriverHandler.getSynth().startTrace()
+		global tracer
+		tracer = TraceRecorder(size)
+
+	def stopTrace(self, path=None):
+		# Stops recording and writes what was recorded to path, by default ttusb-trace.json in the NVDA user config directory. Returns the path.
+		global tracer
+		trace = tracer
+		tracer = None
+		if not trace:
+			return None
+		if path is None:
+			path = os.path.join(globalVars.appArgs.configPath, "ttusb-trace.json")
+		trace.export(path)
+		log.info("TripleTalk trace written to %s" % path)
+		return path
+
+	def startCapture(self, path=None):
+		# Records every byte written to the TT and everything read from it, from the NVDA python console: synthDriverHandler.getSynth().startCapture()
+		# By default it goes to ttusb-capture.ttcap in the NVDA user config directory. Returns the path.
+		global capture
+		global transport
+		self.stopCapture()
+		if path is None:
+			path = os.path.join(globalVars.appArgs.configPath, "ttusb-capture.ttcap")
+		with deviceLock:
+			capture = CaptureWriter(path)
+			if transport:
+				transport = RecordingTransport(transport, capture)
+		log.info("TripleTalk capture started in %s" % path)
+		return path
+
+	def stopCapture(self):
+		global capture
+		global transport
+		if not capture:
+			return None
+		with deviceLock:
+			writer = capture
+			capture = None
+			if isinstance(transport, RecordingTransport):
+				transport = transport.inner
+		writer.close()
+		log.info("TripleTalk capture of %d records written to %s" % (writer.records, writer.path))
+		return writer.path
+
 	def onIndexReached(self, index):
 		if index >= 0:
 			synthIndexReached.notify(synth=self, index=index)
@@ -755,15 +799,21 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 			synthDoneSpeaking.notify(synth=self)
 
 	def pause(self,switch):
-		if not USBTT:
+		if not transport:
 			return
+		if tracer:
+			tracer.instant("pause" if switch else "resume")
 		if switch:
 			self.pauseModeOn = True
-			USBTT.USBTT_WriteByteImmediate(0x10)
+			with deviceLock:
+				if transport:
+					transport.write_immediate(0x10)
 		else:
 			if self.pauseModeOn:
 				self.pauseModeOn = False
-				USBTT.USBTT_WriteByteImmediate(0x12)
+				with deviceLock:
+					if transport:
+						transport.write_immediate(0x12)
 
 	def _get_availablePausemodes(self):
 		return self.pauseModes
@@ -794,3 +844,13 @@ class SynthDriver(synthDriverHandler.SynthDriver):
 
 	def _get_pauseMode(self):
 		return str(self.tt_pauseMode)
+
+	def _get_availableIndexmerges(self):
+		return self.indexMerges
+
+	def _set_indexMerge(self, val):
+		global indexMergeBytes
+		indexMergeBytes = int(val) if val in self.indexMerges else 0
+
+	def _get_indexMerge(self):
+		return str(indexMergeBytes)